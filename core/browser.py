@@ -1,14 +1,59 @@
 """
 Browser management using Playwright
 """
+import atexit
+import threading
+
 from playwright.sync_api import sync_playwright
 
+from core.dom_mapper import PAGE_HELPERS_JS
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def _get_driver():
+    """Start the Playwright driver process once and share it across BrowserManager instances."""
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            _driver = sync_playwright().start()
+        return _driver
+
+
+def _stop_driver():
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            try:
+                _driver.stop()
+            except Exception:
+                pass
+            _driver = None
+
+
+atexit.register(_stop_driver)
+
+# A released page is navigated to about:blank and reused for up to this many URLs,
+# then closed so per-page state (listeners, JS heap) cannot grow without bound.
+PAGE_REUSE_LIMIT = 20
+
+
 class BrowserManager:
     def __init__(self, headless=False):
         self.headless = headless
         self.playwright = None
         self.browser = None
         self.context = None
+        self._idle_pages = []  # (page, uses) ready for the next open_page
+        self._page_uses = {}  # id(page) -> URLs served, for pages currently handed out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
 
     def _cleanup(self):
         """Best-effort cleanup that also resets references."""
@@ -22,41 +67,110 @@ class BrowserManager:
                 self.browser.close()
             except Exception:
                 pass
-        if self.playwright:
-            try:
-                self.playwright.stop()
-            except Exception:
-                pass
+        # Pages die with their context.
+        self._idle_pages = []
+        self._page_uses = {}
+        # The shared driver outlives this manager; it is stopped at interpreter exit.
         self.context = None
         self.browser = None
         self.playwright = None
 
+    def _session_alive(self):
+        """True while the browser connection backing the shared context is usable."""
+        if not (self.playwright and self.browser and self.context):
+            return False
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
     def _ensure_session(self):
-        """Create a fresh Playwright session when none is active."""
-        if self.playwright and self.browser and self.context:
+        """Create a Playwright session once; reuse it until the browser itself goes away."""
+        if self._session_alive():
             return
         self._cleanup()
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=self.headless)
+        self.playwright = _get_driver()
+        try:
+            self.browser = self.playwright.chromium.launch(headless=self.headless)
+        except Exception:
+            # The driver itself may be gone; drop it so the next attempt starts a fresh one.
+            self.playwright = None
+            _stop_driver()
+            raise
         self.context = self.browser.new_context(
             viewport={'width': 1280, 'height': 800},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            service_workers='block',
+            java_script_enabled=True,
         )
+        self.context.add_init_script(script=PAGE_HELPERS_JS)
 
-    def open_page(self, url):
-        """Open a new page and navigate to URL"""
+    def open_page(self, url, wait_until='domcontentloaded', timeout=15000):
+        """
+        Open a new page and navigate to URL.
+        Defaults to domcontentloaded; pass wait_until='networkidle' for pages that need it.
+        """
         last_error = None
         for _ in range(2):
+            page = None
             try:
                 self._ensure_session()
-                page = self.context.new_page()
-                page.goto(url, wait_until='networkidle', timeout=30000)
+                page = self._acquire_page()
+                page.goto(url, wait_until=wait_until, timeout=timeout)
+                if wait_until == 'domcontentloaded':
+                    # Bounded wait for the load event; ad-heavy pages may never settle.
+                    try:
+                        page.wait_for_load_state('load', timeout=5000)
+                    except Exception:
+                        pass
                 return page
             except Exception as e:
                 last_error = e
-                self._cleanup()
+                # Navigation errors only cost the page; keep browser/context for the retry.
+                if page is not None:
+                    self._page_uses.pop(id(page), None)
+                    try:
+                        page.close()
+                    except Exception:
+                        pass
+                if not self._session_alive():
+                    self._cleanup()
         raise last_error
 
+    def _acquire_page(self):
+        """A warm idle page from the pool, or a new one from the shared context."""
+        while self._idle_pages:
+            page, uses = self._idle_pages.pop()
+            try:
+                if not page.is_closed():
+                    self._page_uses[id(page)] = uses
+                    return page
+            except Exception:
+                pass
+        page = self.context.new_page()
+        self._page_uses[id(page)] = 0
+        return page
+
+    def release_page(self, page):
+        """
+        Hand a page from open_page back for reuse (instead of page.close()).
+        Pages past PAGE_REUSE_LIMIT, or that cannot be blanked, are closed.
+        """
+        if page is None:
+            return
+        uses = self._page_uses.pop(id(page), PAGE_REUSE_LIMIT) + 1
+        try:
+            if uses < PAGE_REUSE_LIMIT and self._session_alive() and not page.is_closed():
+                page.goto("about:blank", timeout=5000)
+                self._idle_pages.append((page, uses))
+                return
+        except Exception:
+            pass
+        try:
+            page.close()
+        except Exception:
+            pass
+
     def close(self):
         """Close browser and cleanup"""
         self._cleanup()
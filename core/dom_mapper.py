@@ -1,135 +1,383 @@
 """
 Pixel-to-DOM mapping with iframe/shadow-aware DOM harvesting.
 """
-import cv2
+import sys
+
 import numpy as np
+from PIL import Image
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; NumPy NMS is used instead
+    njit = None
+
+
+def _nms_numpy(x1, y1, x2, y2, areas, iou_threshold):
+    """Greedy NMS over a full pairwise IoU matrix; returns kept indices."""
+    n = len(areas)
+    # Three float32 scratch matrices, filled in place; no other NxN temporaries.
+    inter = np.empty((n, n), dtype=np.float32)
+    tmp = np.empty((n, n), dtype=np.float32)
+    iou = np.empty((n, n), dtype=np.float32)
+
+    np.minimum(x2[:, None], x2[None, :], out=inter)
+    np.maximum(x1[:, None], x1[None, :], out=tmp)
+    inter -= tmp
+    np.maximum(inter, 0, out=inter)
+    np.minimum(y2[:, None], y2[None, :], out=tmp)
+    np.maximum(y1[:, None], y1[None, :], out=iou)
+    tmp -= iou
+    np.maximum(tmp, 0, out=tmp)
+    inter *= tmp
+
+    np.add(areas[:, None], areas[None, :], out=iou)
+    iou -= inter
+    iou += 1e-6
+    np.divide(inter, iou, out=iou)
+
+    alive = np.ones(n, dtype=bool)
+    keep = []
+    for i in np.argsort(-areas, kind="stable"):
+        if not alive[i]:
+            continue
+        keep.append(int(i))
+        alive &= iou[i] < iou_threshold
+    return keep
+
+
+_nms_numba = None
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _nms_numba(x1, y1, x2, y2, areas, iou_threshold):
+        """Greedy NMS with scalar IoU math; linear memory, no NxN matrix."""
+        n = areas.shape[0]
+        order = np.argsort(-areas, kind="mergesort")
+        suppressed = np.zeros(n, dtype=np.bool_)
+        keep = np.empty(n, dtype=np.int64)
+        k = 0
+        for a in range(n):
+            i = order[a]
+            if suppressed[i]:
+                continue
+            keep[k] = i
+            k += 1
+            for b in range(a + 1, n):
+                j = order[b]
+                if suppressed[j]:
+                    continue
+                w = min(x2[i], x2[j]) - max(x1[i], x1[j])
+                h = min(y2[i], y2[j]) - max(y1[i], y1[j])
+                if w <= 0 or h <= 0:
+                    continue
+                inter = w * h
+                if inter / (areas[i] + areas[j] - inter + 1e-6) >= iou_threshold:
+                    suppressed[j] = True
+        return keep[:k]
+
+    # Compile (or load from the on-disk cache) up front so the first page doesn't pay for it.
+    try:
+        _warm = np.zeros(1, dtype=np.float32)
+        _nms_numba(_warm, _warm, _warm + 1, _warm + 1, _warm + 1, np.float32(0.3))
+    except Exception:
+        _nms_numba = None
+
+
+# Resolves the (shadow-piercing) element at a viewport point and describes it.
+_DESCRIBE_AT_JS = """({centerX, centerY}) => {
+    const cssEscape = (v) => {
+        if (window.CSS && CSS.escape) return CSS.escape(v);
+        return String(v).replace(/["\\\\]/g, "\\\\$&");
+    };
+    const textNorm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+
+    const deepElementFromPoint = (root, x, y) => {
+        let el = root.elementFromPoint(x, y);
+        if (!el) return null;
+        while (el && el.shadowRoot) {
+            const inner = el.shadowRoot.elementFromPoint(x, y);
+            if (!inner || inner === el) break;
+            el = inner;
+        }
+        return el;
+    };
+
+    const getXPath = (node) => {
+        if (!node) return null;
+        if (node.id) return `//*[@id="${node.id}"]`;
+        const attrs = ['name', 'data-testid', 'aria-label', 'placeholder'];
+        for (const attr of attrs) {
+            const val = node.getAttribute && node.getAttribute(attr);
+            if (val) return `//${node.tagName.toLowerCase()}[@${attr}="${val}"]`;
+        }
+        const parts = [];
+        let current = node;
+        while (current && current.nodeType === 1) {
+            const parent = current.parentElement;
+            let index = 0;
+            if (parent) {
+                for (const sibling of parent.children) {
+                    if (sibling === current) break;
+                    if (sibling.tagName === current.tagName) index++;
+                }
+            }
+            const tagName = current.tagName.toLowerCase();
+            parts.unshift(index ? `${tagName}[${index + 1}]` : tagName);
+            current = parent;
+        }
+        return parts.length ? '/' + parts.join('/') : null;
+    };
+
+    // JSON string literals double as quoted CSS attribute values.
+    const esc = (v) => JSON.stringify(v);
+    const buildSelector = (el) => {
+        const tag = (el.tagName || '').toLowerCase();
+        if (!tag) return '';
+        if (el.id) return `#${cssEscape(el.id)}`;
+        for (const attr of ['name', 'aria-label', 'placeholder']) {
+            const v = el.getAttribute(attr);
+            if (v) return `${tag}[${attr}=${esc(v)}]`;
+        }
+        return tag;
+    };
+
+    const el = deepElementFromPoint(document, centerX, centerY);
+    if (!el) return null;
+
+    const attrs = {};
+    ['type', 'name', 'id', 'class', 'placeholder', 'aria-label'].forEach(attr => {
+        const v = el.getAttribute && el.getAttribute(attr);
+        if (v) attrs[attr] = v;
+    });
+
+    let labelText = '';
+    try {
+        if (el.labels && el.labels.length > 0) {
+            labelText = Array.from(el.labels).map(l => textNorm(l.innerText || l.textContent)).join(' ');
+        } else if (el.id) {
+            const l = document.querySelector(`label[for="${el.id}"]`);
+            if (l) labelText = textNorm(l.innerText || l.textContent);
+        }
+    } catch (e) {}
+
+    let nearbyText = '';
+    try {
+        const parent = el.closest('label, .form-group, .field, .input-group') || el.parentElement;
+        if (parent) nearbyText = textNorm(parent.innerText || parent.textContent).slice(0, 300);
+    } catch (e) {}
+    attrs['label_text'] = labelText;
+    attrs['nearby_text'] = nearbyText;
+
+    return {
+        tagName: (el.tagName || '').toLowerCase(),
+        xpath: getXPath(el),
+        selector: buildSelector(el),
+        attributes: attrs
+    };
+}"""
+
+
+# Collects every fillable field in a frame (light DOM, then open shadow roots)
+# with its viewport rect and metadata, so harvesting costs one evaluate per frame.
+_HARVEST_FIELDS_JS = """({selector}) => {
+    const textNorm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+    const cssEscape = (v) => {
+        if (window.CSS && CSS.escape) return CSS.escape(v);
+        return String(v).replace(/["\\\\]/g, "\\\\$&");
+    };
+
+    // Positional path; sibling counting scans element children only, never text nodes.
+    const getXPath = (n) => {
+        if (n.id) return `//*[@id="${n.id}"]`;
+        const parts = [];
+        let cur = n;
+        while (cur && cur.nodeType === 1) {
+            const parent = cur.parentElement;
+            let index = 0;
+            if (parent) {
+                for (const sib of parent.children) {
+                    if (sib === cur) break;
+                    if (sib.tagName === cur.tagName) index++;
+                }
+            }
+            const tag = cur.tagName.toLowerCase();
+            parts.unshift(index ? `${tag}[${index + 1}]` : tag);
+            cur = parent;
+        }
+        return parts.length ? '/' + parts.join('/') : null;
+    };
+
+    const describe = (node, source) => {
+        const rect = node.getBoundingClientRect();
+        if (!rect || rect.width < 8 || rect.height < 8) return null;
+        const tag = (node.tagName || '').toLowerCase();
+        const attrs = {};
+        ['type','name','id','class','placeholder','aria-label'].forEach(k => {
+            const val = node.getAttribute(k);
+            if (val) attrs[k] = val;
+        });
+        let labelText = '';
+        try {
+            if (node.labels && node.labels.length) {
+                labelText = Array.from(node.labels).map(l => textNorm(l.innerText || l.textContent)).join(' ');
+            } else if (node.id) {
+                const l = node.getRootNode().querySelector(`label[for="${node.id}"]`);
+                if (l) labelText = textNorm(l.innerText || l.textContent);
+            }
+        } catch (e) {}
+        let nearbyText = '';
+        try {
+            const p = node.closest('label, .form-group, .field, .input-group') || node.parentElement;
+            if (p) nearbyText = textNorm(p.innerText || p.textContent).slice(0, 300);
+        } catch (e) {}
+        attrs['label_text'] = labelText;
+        attrs['nearby_text'] = nearbyText;
+
+        // Reuse the attribute values read above; JSON string literals are valid CSS strings.
+        let selector = tag;
+        if (node.id) selector = `#${cssEscape(node.id)}`;
+        else if (attrs['name']) selector = `${tag}[name=${JSON.stringify(attrs['name'])}]`;
+        else if (attrs['aria-label']) selector = `${tag}[aria-label=${JSON.stringify(attrs['aria-label'])}]`;
+        else if (attrs['placeholder']) selector = `${tag}[placeholder=${JSON.stringify(attrs['placeholder'])}]`;
+
+        // XPath does not pierce shadow roots, so only light DOM nodes get one. It is always
+        // built: fields sharing a selector (radio groups, same-name inputs in separate forms)
+        // are told apart only by their positional path.
+        const xpath = source === 'dom' ? getXPath(node) : null;
+
+        return {
+            x: rect.x, y: rect.y, w: rect.width, h: rect.height,
+            dom_type: tag,
+            attributes: attrs,
+            selector: selector,
+            xpath: xpath,
+            source: source,
+        };
+    };
+
+    const out = [];
+    for (const n of document.querySelectorAll(selector)) {
+        const d = describe(n, 'dom');
+        if (d) out.push(d);
+    }
+
+    // Shadow hosts need a full element scan; fields inside each root are matched natively.
+    const pushHosts = (root, roots) => {
+        for (const n of root.querySelectorAll('*')) {
+            if (n.shadowRoot) roots.push(n.shadowRoot);
+        }
+    };
+    const roots = [];
+    pushHosts(document, roots);
+    while (roots.length) {
+        const root = roots.pop();
+        for (const n of root.querySelectorAll(selector)) {
+            const d = describe(n, 'shadow_dom');
+            if (d) out.push(d);
+        }
+        pushHosts(root, roots);
+    }
+    return out;
+}"""
+
+
+# Batched describeAt over a list of {centerX, centerY} points (one round-trip for all CV boxes).
+_DESCRIBE_POINTS_JS = (
+    "(points) => { const describeAt = " + _DESCRIBE_AT_JS + "; return points.map((p) => describeAt(p)); }"
+)
+
+
+# Viewport rects of the frame's own iframe hosts, used to offset child-frame fields.
+_IFRAME_RECTS_JS = """() => Array.from(document.querySelectorAll('iframe')).map(f => {
+    const r = f.getBoundingClientRect();
+    return {src: f.src || '', name: f.name || '', x: r.x, y: r.y, w: r.width, h: r.height};
+})"""
+
+
+# Main-frame snapshot: scroll/DPR transforms, iframe rects and fields read together, so
+# find_form_elements needs no separate round-trip for transforms or frame offsets.
+_HARVEST_PAGE_JS = (
+    "(args) => { const harvestFields = " + _HARVEST_FIELDS_JS + ";\n"
+    "const iframeRects = " + _IFRAME_RECTS_JS + ";\n"
+    "return {scrollX: window.scrollX, scrollY: window.scrollY, "
+    "devicePixelRatio: window.devicePixelRatio || 1, "
+    "iframes: iframeRects(), fields: harvestFields(args)}; }"
+)
+
+_FIELD_SELECTOR = "input, textarea, select, button[type='submit'], [contenteditable='true']"
+
+
+# Installed once per browser context (see BrowserManager) so evaluate calls only ship
+# a helper name and arguments instead of the full function source every time.
+PAGE_HELPERS_JS = (
+    "window.__ff = window.__ff || {};\n"
+    f"window.__ff.describeAt = {_DESCRIBE_AT_JS};\n"
+    f"window.__ff.harvestFields = {_HARVEST_FIELDS_JS};\n"
+    f"window.__ff.describePoints = {_DESCRIBE_POINTS_JS};\n"
+    f"window.__ff.harvestPage = {_HARVEST_PAGE_JS};\n"
+)
 
 
 class DOMMapper:
     @staticmethod
-    def get_element_with_transforms(page, box, viewport_coords=False, screenshot_origin_px=(0, 0)):
+    def get_element_with_transforms(page, box, viewport_coords=False, screenshot_origin_px=(0, 0),
+                                    transforms=None):
         """
         Resolve element at a given point (supports open shadow roots).
         For iframe fields, rely on frame-aware DOM harvesting in find_form_elements().
+        Pass `transforms` (scrollX/scrollY/devicePixelRatio) to skip re-reading them from the page.
         """
+        center_x, center_y = DOMMapper._box_center(page, box, viewport_coords, screenshot_origin_px, transforms)
+        result = DOMMapper._call_page_helper(
+            page, "describeAt", _DESCRIBE_AT_JS, {"centerX": center_x, "centerY": center_y}
+        )
+        return DOMMapper._dom_info_at_point(page, result, (center_x, center_y))
+
+    @staticmethod
+    def get_elements_at_boxes(page, boxes, screenshot_origin_px=(0, 0), transforms=None):
+        """
+        Batched get_element_with_transforms for screenshot-pixel boxes: one evaluate for all
+        of them. Returns a list aligned with `boxes` (None where nothing was found).
+        """
+        if not boxes:
+            return []
+        if transforms is None:
+            transforms = DOMMapper._read_transforms(page)
+        centers = [DOMMapper._box_center(page, box, False, screenshot_origin_px, transforms) for box in boxes]
+        results = DOMMapper._call_page_helper(
+            page,
+            "describePoints",
+            _DESCRIBE_POINTS_JS,
+            [{"centerX": cx, "centerY": cy} for cx, cy in centers],
+        ) or []
+        return [DOMMapper._dom_info_at_point(page, r, c) for r, c in zip(results, centers)]
+
+    @staticmethod
+    def _box_center(page, box, viewport_coords, screenshot_origin_px, transforms):
+        """Viewport CSS center of a box given in viewport coords or screenshot pixels."""
         x, y, w, h = box
 
         if viewport_coords:
-            center_x = x + w / 2
-            center_y = y + h / 2
-        else:
-            transforms = page.evaluate("""() => ({
-                scrollX: window.scrollX,
-                scrollY: window.scrollY,
-                devicePixelRatio: window.devicePixelRatio || 1
-            })""")
-            dpr = float(transforms.get("devicePixelRatio", 1) or 1)
-            scroll_x = float(transforms.get("scrollX", 0) or 0)
-            scroll_y = float(transforms.get("scrollY", 0) or 0)
-            origin_x, origin_y = screenshot_origin_px
-
-            abs_x = x + origin_x
-            abs_y = y + origin_y
-            page_css_x = abs_x / dpr
-            page_css_y = abs_y / dpr
-            viewport_x = page_css_x - scroll_x
-            viewport_y = page_css_y - scroll_y
-            center_x = viewport_x + (w / dpr) / 2.0
-            center_y = viewport_y + (h / dpr) / 2.0
-
-        result = page.evaluate(
-            """({centerX, centerY}) => {
-                const cssEscape = (v) => {
-                    if (window.CSS && CSS.escape) return CSS.escape(v);
-                    return String(v).replace(/["\\\\]/g, "\\\\$&");
-                };
-                const textNorm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
-
-                const deepElementFromPoint = (root, x, y) => {
-                    let el = root.elementFromPoint(x, y);
-                    if (!el) return null;
-                    while (el && el.shadowRoot) {
-                        const inner = el.shadowRoot.elementFromPoint(x, y);
-                        if (!inner || inner === el) break;
-                        el = inner;
-                    }
-                    return el;
-                };
-
-                const getXPath = (node) => {
-                    if (!node) return null;
-                    if (node.id) return `//*[@id="${node.id}"]`;
-                    const attrs = ['name', 'data-testid', 'aria-label', 'placeholder'];
-                    for (const attr of attrs) {
-                        const val = node.getAttribute && node.getAttribute(attr);
-                        if (val) return `//${node.tagName.toLowerCase()}[@${attr}="${val}"]`;
-                    }
-                    const parts = [];
-                    let current = node;
-                    while (current && current.nodeType === 1) {
-                        let index = 0;
-                        let sibling = current.previousSibling;
-                        while (sibling) {
-                            if (sibling.nodeType === 1 && sibling.tagName === current.tagName) index++;
-                            sibling = sibling.previousSibling;
-                        }
-                        const tagName = current.tagName.toLowerCase();
-                        parts.unshift(index ? `${tagName}[${index + 1}]` : tagName);
-                        current = current.parentNode;
-                    }
-                    return parts.length ? '/' + parts.join('/') : null;
-                };
-
-                const buildSelector = (el) => {
-                    const tag = (el.tagName || '').toLowerCase();
-                    if (!tag) return '';
-                    if (el.id) return `#${cssEscape(el.id)}`;
-                    const name = el.getAttribute('name');
-                    if (name) return `${tag}[name="${name.replace(/"/g, '\\"')}"]`;
-                    const aria = el.getAttribute('aria-label');
-                    if (aria) return `${tag}[aria-label="${aria.replace(/"/g, '\\"')}"]`;
-                    const placeholder = el.getAttribute('placeholder');
-                    if (placeholder) return `${tag}[placeholder="${placeholder.replace(/"/g, '\\"')}"]`;
-                    return tag;
-                };
-
-                const el = deepElementFromPoint(document, centerX, centerY);
-                if (!el) return null;
-
-                const attrs = {};
-                ['type', 'name', 'id', 'class', 'placeholder', 'aria-label'].forEach(attr => {
-                    const v = el.getAttribute && el.getAttribute(attr);
-                    if (v) attrs[attr] = v;
-                });
-
-                let labelText = '';
-                try {
-                    if (el.labels && el.labels.length > 0) {
-                        labelText = Array.from(el.labels).map(l => textNorm(l.innerText || l.textContent)).join(' ');
-                    } else if (el.id) {
-                        const l = document.querySelector(`label[for="${el.id}"]`);
-                        if (l) labelText = textNorm(l.innerText || l.textContent);
-                    }
-                } catch (e) {}
-
-                let nearbyText = '';
-                try {
-                    const parent = el.closest('label, .form-group, .field, .input-group') || el.parentElement;
-                    if (parent) nearbyText = textNorm(parent.innerText || parent.textContent).slice(0, 300);
-                } catch (e) {}
-                attrs['label_text'] = labelText;
-                attrs['nearby_text'] = nearbyText;
-
-                return {
-                    tagName: (el.tagName || '').toLowerCase(),
-                    xpath: getXPath(el),
-                    selector: buildSelector(el),
-                    attributes: attrs
-                };
-            }""",
-            {"centerX": center_x, "centerY": center_y},
-        )
+            return x + w / 2, y + h / 2
 
+        if transforms is None:
+            transforms = DOMMapper._read_transforms(page)
+        dpr = float(transforms.get("devicePixelRatio", 1) or 1)
+        scroll_x = float(transforms.get("scrollX", 0) or 0)
+        scroll_y = float(transforms.get("scrollY", 0) or 0)
+        origin_x, origin_y = screenshot_origin_px
+
+        abs_x = x + origin_x
+        abs_y = y + origin_y
+        page_css_x = abs_x / dpr
+        page_css_y = abs_y / dpr
+        viewport_x = page_css_x - scroll_x
+        viewport_y = page_css_y - scroll_y
+        center_x = viewport_x + (w / dpr) / 2.0
+        center_y = viewport_y + (h / dpr) / 2.0
+        return center_x, center_y
+
+    @staticmethod
+    def _dom_info_at_point(page, result, center):
         if not result:
             return None
 
@@ -139,7 +387,7 @@ class DOMMapper:
             "selector": result.get("selector", ""),
             "type": result.get("tagName", "div").lower(),
             "attributes": result.get("attributes", {}),
-            "viewport_coords": (center_x, center_y),
+            "viewport_coords": center,
             "frame_url": page.url,
             "frame_name": "",
             "frame_path": "main",
@@ -152,38 +400,55 @@ class DOMMapper:
         1) Collect DOM elements from main frame + iframes + open shadow roots.
         2) Merge with CV detections.
         3) Map remaining CV boxes via elementFromPoint fallback.
+        `boxes` may be a Future; it is only awaited once the DOM has been harvested.
         """
         elements = []
         origin_x, origin_y = screenshot_origin_px
 
-        img = cv2.imread(screenshot_path)
-        img_h = img.shape[0] if img is not None else None
-        img_w = img.shape[1] if img is not None else None
+        img_w, img_h = DOMMapper._image_size(screenshot_path)
 
-        transforms = page.evaluate("""() => ({
-            scrollX: window.scrollX,
-            scrollY: window.scrollY,
-            devicePixelRatio: window.devicePixelRatio || 1
-        })""")
+        main_harvest = DOMMapper._harvest_main_frame(page)
+        transforms = main_harvest if main_harvest is not None else DOMMapper._read_transforms(page)
         dpr = float(transforms.get("devicePixelRatio", 1) or 1)
         scroll_x = float(transforms.get("scrollX", 0) or 0)
         scroll_y = float(transforms.get("scrollY", 0) or 0)
 
-        dom_items = DOMMapper._collect_dom_items(page, img_w, img_h, dpr, scroll_x, scroll_y, origin_x, origin_y)
-
-        all_detections = []
-        for det in boxes:
-            if len(det) == 5:
-                x, y, w, h, _ = det
-                all_detections.append((x, y, w, h, None))
-        for item in dom_items:
-            all_detections.append((item["sx"], item["sy"], item["sw"], item["sh"], item))
+        dom_items = DOMMapper._collect_dom_items(
+            page, img_w, img_h, dpr, scroll_x, scroll_y, origin_x, origin_y,
+            main_harvest=main_harvest,
+        )
 
-        unique = DOMMapper._deduplicate_detections(all_detections)
+        if hasattr(boxes, "result"):
+            boxes = boxes.result()
+
+        # Boxes live in one (N, 4) float32 array; payloads (None for CV boxes) in a parallel list.
+        cv_boxes = [det for det in boxes if len(det) == 5]
+        detection_boxes = np.empty((len(cv_boxes) + len(dom_items), 4), dtype=np.float32)
+        payloads = []
+        for row, det in enumerate(cv_boxes):
+            detection_boxes[row] = det[:4]
+            payloads.append(None)
+        offset = len(cv_boxes)
+        for row, item in enumerate(dom_items, start=offset):
+            detection_boxes[row] = (item["sx"], item["sy"], item["sw"], item["sh"])
+            payloads.append(item)
+
+        keep = DOMMapper._deduplicate_detections(detection_boxes, payloads)
         seen_keys = set()
 
-        for det in unique:
-            x, y, w, h, item = det
+        # Resolve every surviving CV-only box in one batched round-trip.
+        cv_keep = [i for i in keep if payloads[i] is None]
+        cv_results = DOMMapper.get_elements_at_boxes(
+            page,
+            [tuple(float(v) for v in detection_boxes[i]) for i in cv_keep],
+            screenshot_origin_px=screenshot_origin_px,
+            transforms=transforms,
+        )
+        cv_dom_infos = dict(zip(cv_keep, cv_results))
+
+        for i in keep:
+            x, y, w, h = detection_boxes[i]
+            item = payloads[i]
             if item is not None:
                 dom_info = {
                     "xpath": item.get("xpath"),
@@ -196,12 +461,7 @@ class DOMMapper:
                 }
                 source = item.get("source", "dom")
             else:
-                dom_info = DOMMapper.get_element_with_transforms(
-                    page,
-                    (x, y, w, h),
-                    viewport_coords=False,
-                    screenshot_origin_px=screenshot_origin_px,
-                )
+                dom_info = cv_dom_infos.get(i)
                 source = "cv"
                 if not dom_info:
                     continue
@@ -221,232 +481,212 @@ class DOMMapper:
         return elements
 
     @staticmethod
-    def _collect_dom_items(page, img_w, img_h, dpr, scroll_x, scroll_y, origin_x, origin_y):
+    def _call_page_helper(target, name, source, arg):
+        """
+        Run a window.__ff helper in a page/frame; fall back to shipping `source`
+        when the helpers were not installed (page created outside BrowserManager).
+        """
+        wrapped = target.evaluate(
+            f"(arg) => (window.__ff && window.__ff.{name}) ? [window.__ff.{name}(arg)] : null",
+            arg,
+        )
+        if wrapped is not None:
+            return wrapped[0]
+        return target.evaluate(source, arg)
+
+    @staticmethod
+    def _image_size(image_path):
+        """(width, height) from the image header without decoding pixels; (None, None) if unreadable."""
+        try:
+            with Image.open(image_path) as im:
+                return im.size
+        except Exception:
+            return None, None
+
+    @staticmethod
+    def _harvest_main_frame(page):
+        """Main-frame snapshot (transforms, iframe rects, fields) or None if it failed."""
+        try:
+            return DOMMapper._call_page_helper(
+                page,
+                "harvestPage",
+                _HARVEST_PAGE_JS,
+                {"selector": _FIELD_SELECTOR},
+            )
+        except Exception:
+            return None
+
+    @staticmethod
+    def _read_transforms(page):
+        return page.evaluate("""() => ({
+            scrollX: window.scrollX,
+            scrollY: window.scrollY,
+            devicePixelRatio: window.devicePixelRatio || 1
+        })""")
+
+    @staticmethod
+    def _collect_dom_items(page, img_w, img_h, dpr, scroll_x, scroll_y, origin_x, origin_y,
+                           main_harvest=None):
         items = []
-        frame_offsets = DOMMapper._frame_offsets(page)
+        seen = set()
+        frame_rects = DOMMapper._frame_rects(
+            page, iframe_rects=main_harvest.get("iframes") if main_harvest is not None else None
+        )
 
-        selector = "input, textarea, select, button[type='submit'], [contenteditable='true']"
         for frame in page.frames:
-            frame_url = getattr(frame, "url", "") or ""
-            frame_name = getattr(frame, "name", "") or ""
+            frame_url = sys.intern(getattr(frame, "url", "") or "")
+            frame_name = sys.intern(getattr(frame, "name", "") or "")
             frame_path = DOMMapper._frame_path(frame, page)
-            frame_ox, frame_oy = frame_offsets.get(frame, (0.0, 0.0))
+            frame_ox, frame_oy, frame_w, frame_h = frame_rects.get(frame, (0.0, 0.0, None, None))
 
-            # Standard frame DOM elements.
-            try:
-                for el in frame.query_selector_all(selector):
-                    try:
-                        b = el.bounding_box()
-                        if not b:
-                            continue
-                        vx = float(b["x"])
-                        vy = float(b["y"])
-                        vw = float(b["width"])
-                        vh = float(b["height"])
-                        if vw < 8 or vh < 8:
-                            continue
-
-                        sx_abs = int((vx + scroll_x) * dpr)
-                        sy_abs = int((vy + scroll_y) * dpr)
-                        sw = int(vw * dpr)
-                        sh = int(vh * dpr)
-                        sx = sx_abs - origin_x
-                        sy = sy_abs - origin_y
-                        if not DOMMapper._overlaps_image(sx, sy, sw, sh, img_w, img_h):
-                            continue
-
-                        meta = el.evaluate("""(node) => {
-                            const textNorm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
-                            const cssEscape = (v) => {
-                                if (window.CSS && CSS.escape) return CSS.escape(v);
-                                return String(v).replace(/["\\\\]/g, "\\\\$&");
-                            };
-                            const attrs = {};
-                            ['type','name','id','class','placeholder','aria-label'].forEach(k => {
-                                const val = node.getAttribute(k);
-                                if (val) attrs[k] = val;
-                            });
-                            let labelText = '';
-                            try {
-                                if (node.labels && node.labels.length) {
-                                    labelText = Array.from(node.labels).map(l => textNorm(l.innerText || l.textContent)).join(' ');
-                                } else if (node.id) {
-                                    const l = document.querySelector(`label[for="${node.id}"]`);
-                                    if (l) labelText = textNorm(l.innerText || l.textContent);
-                                }
-                            } catch (e) {}
-                            let nearbyText = '';
-                            try {
-                                const p = node.closest('label, .form-group, .field, .input-group') || node.parentElement;
-                                if (p) nearbyText = textNorm(p.innerText || p.textContent).slice(0, 300);
-                            } catch (e) {}
-                            attrs['label_text'] = labelText;
-                            attrs['nearby_text'] = nearbyText;
-
-                            let selector = (node.tagName || '').toLowerCase();
-                            if (node.id) selector = `#${cssEscape(node.id)}`;
-                            else if (node.getAttribute('name')) {
-                                selector = `${(node.tagName || '').toLowerCase()}[name="${node.getAttribute('name').replace(/"/g, '\\"')}"]`;
-                            } else if (node.getAttribute('aria-label')) {
-                                selector = `${(node.tagName || '').toLowerCase()}[aria-label="${node.getAttribute('aria-label').replace(/"/g, '\\"')}"]`;
-                            } else if (node.getAttribute('placeholder')) {
-                                selector = `${(node.tagName || '').toLowerCase()}[placeholder="${node.getAttribute('placeholder').replace(/"/g, '\\"')}"]`;
-                            }
-
-                            const getXPath = (n) => {
-                                if (n.id) return `//*[@id="${n.id}"]`;
-                                const parts = [];
-                                let cur = n;
-                                while (cur && cur.nodeType === 1) {
-                                    let index = 0;
-                                    let sib = cur.previousSibling;
-                                    while (sib) {
-                                        if (sib.nodeType === 1 && sib.tagName === cur.tagName) index++;
-                                        sib = sib.previousSibling;
-                                    }
-                                    const tag = cur.tagName.toLowerCase();
-                                    parts.unshift(index ? `${tag}[${index + 1}]` : tag);
-                                    cur = cur.parentNode;
-                                }
-                                return parts.length ? '/' + parts.join('/') : null;
-                            };
-
-                            return {
-                                dom_type: (node.tagName || '').toLowerCase(),
-                                attributes: attrs,
-                                selector,
-                                xpath: getXPath(node)
-                            };
-                        }""")
-                        if not meta:
-                            continue
-                        items.append({
-                            "sx": sx, "sy": sy, "sw": sw, "sh": sh,
-                            "dom_type": meta.get("dom_type", "div"),
-                            "attributes": meta.get("attributes", {}),
-                            "selector": meta.get("selector", ""),
-                            "xpath": meta.get("xpath"),
-                            "frame_url": frame_url,
-                            "frame_name": frame_name,
-                            "frame_path": frame_path,
-                            "source": "dom",
-                        })
-                    except Exception:
-                        continue
-            except Exception:
-                pass
+            # Skip frames that cannot contribute a field: detached, hidden/tracking-pixel
+            # iframes, or iframes entirely outside the screenshot.
+            if frame.is_detached():
+                continue
+            if frame_w is not None and frame_h is not None:
+                if frame_w < 8 or frame_h < 8:
+                    continue
+                if not DOMMapper._overlaps_image(
+                    int((frame_ox + scroll_x) * dpr) - origin_x,
+                    int((frame_oy + scroll_y) * dpr) - origin_y,
+                    int(frame_w * dpr),
+                    int(frame_h * dpr),
+                    img_w,
+                    img_h,
+                ):
+                    continue
 
-            # Open shadow-root fields (same frame).
-            try:
-                shadow_meta = frame.evaluate("""() => {
-                    const textNorm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
-                    const cssEscape = (v) => {
-                        if (window.CSS && CSS.escape) return CSS.escape(v);
-                        return String(v).replace(/["\\\\]/g, "\\\\$&");
-                    };
-                    const roots = [document];
-                    const out = [];
-                    const seen = new WeakSet();
-                    while (roots.length) {
-                        const root = roots.pop();
-                        const nodes = root.querySelectorAll('*');
-                        for (const n of nodes) {
-                            if (n.shadowRoot) roots.push(n.shadowRoot);
-                            if (seen.has(n)) continue;
-                            seen.add(n);
-                            const tag = (n.tagName || '').toLowerCase();
-                            const type = (n.getAttribute && n.getAttribute('type') || '').toLowerCase();
-                            const isField =
-                                tag === 'input' || tag === 'textarea' || tag === 'select' ||
-                                (tag === 'button' && type === 'submit') ||
-                                n.getAttribute('contenteditable') === 'true';
-                            if (!isField) continue;
-                            const rect = n.getBoundingClientRect();
-                            if (!rect || rect.width < 8 || rect.height < 8) continue;
-                            const attrs = {};
-                            ['type','name','id','class','placeholder','aria-label'].forEach(k => {
-                                const val = n.getAttribute(k);
-                                if (val) attrs[k] = val;
-                            });
-                            attrs['label_text'] = '';
-                            attrs['nearby_text'] = textNorm((n.parentElement && n.parentElement.textContent) || '').slice(0, 300);
-                            let selector = tag;
-                            if (n.id) selector = `#${cssEscape(n.id)}`;
-                            else if (n.getAttribute('name')) selector = `${tag}[name="${n.getAttribute('name').replace(/"/g, '\\"')}"]`;
-                            else if (n.getAttribute('aria-label')) selector = `${tag}[aria-label="${n.getAttribute('aria-label').replace(/"/g, '\\"')}"]`;
-                            else if (n.getAttribute('placeholder')) selector = `${tag}[placeholder="${n.getAttribute('placeholder').replace(/"/g, '\\"')}"]`;
-                            out.push({
-                                x: rect.x, y: rect.y, w: rect.width, h: rect.height,
-                                dom_type: tag,
-                                attributes: attrs,
-                                selector: selector,
-                            });
-                        }
-                    }
-                    return out;
-                }""")
-                for m in shadow_meta or []:
-                    vx = float(m.get("x", 0)) + frame_ox
-                    vy = float(m.get("y", 0)) + frame_oy
-                    vw = float(m.get("w", 0))
-                    vh = float(m.get("h", 0))
-                    if vw < 8 or vh < 8:
-                        continue
-                    sx_abs = int((vx + scroll_x) * dpr)
-                    sy_abs = int((vy + scroll_y) * dpr)
-                    sw = int(vw * dpr)
-                    sh = int(vh * dpr)
-                    sx = sx_abs - origin_x
-                    sy = sy_abs - origin_y
-                    if not DOMMapper._overlaps_image(sx, sy, sw, sh, img_w, img_h):
-                        continue
-                    items.append({
-                        "sx": sx, "sy": sy, "sw": sw, "sh": sh,
-                        "dom_type": m.get("dom_type", "div"),
-                        "attributes": m.get("attributes", {}),
-                        "selector": m.get("selector", ""),
-                        "xpath": None,
-                        "frame_url": frame_url,
-                        "frame_name": frame_name,
-                        "frame_path": frame_path,
-                        "source": "shadow_dom",
-                    })
-            except Exception:
-                pass
+            # Light DOM and open shadow-root fields in one round-trip per frame
+            # (none for the main frame when its snapshot was already taken).
+            if frame == page.main_frame and main_harvest is not None:
+                harvested = main_harvest.get("fields")
+            else:
+                try:
+                    harvested = DOMMapper._call_page_helper(
+                        frame,
+                        "harvestFields",
+                        _HARVEST_FIELDS_JS,
+                        {"selector": _FIELD_SELECTOR},
+                    )
+                except Exception:
+                    continue
 
-        # Deduplicate collected DOM candidates by selector/frame and IoU.
-        dedup = []
-        seen = set()
-        for item in items:
-            key = (
-                item.get("frame_url", ""),
-                item.get("frame_name", ""),
-                item.get("selector", ""),
-                item.get("xpath") or "",
-            )
-            if key in seen:
+            if not harvested:
                 continue
-            seen.add(key)
-            dedup.append(item)
-        return dedup
+            rects = DOMMapper._screenshot_rects(
+                harvested, frame_ox, frame_oy, dpr, scroll_x, scroll_y, origin_x, origin_y
+            )
+            keep = DOMMapper._visible_rect_mask(rects, img_w, img_h)
+
+            for i in np.nonzero(keep)[0]:
+                m = harvested[i]
+                sx, sy, sw, sh = (int(v) for v in rects[i])
+                # Deduplicate by frame/selector/xpath as items are collected.
+                item_selector = m.get("selector", "")
+                item_xpath = m.get("xpath")
+                key = (frame_url, frame_name, item_selector, item_xpath or "")
+                if key in seen:
+                    continue
+                seen.add(key)
+                items.append({
+                    "sx": sx, "sy": sy, "sw": sw, "sh": sh,
+                    "dom_type": m.get("dom_type", "div"),
+                    "attributes": m.get("attributes", {}),
+                    "selector": item_selector,
+                    "xpath": item_xpath,
+                    "frame_url": frame_url,
+                    "frame_name": frame_name,
+                    "frame_path": frame_path,
+                    "source": m.get("source", "dom"),
+                })
+
+        return items
 
     @staticmethod
-    def _frame_offsets(page):
-        offsets = {}
-        for frame in page.frames:
-            if frame == page.main_frame:
-                offsets[frame] = (0.0, 0.0)
-                continue
+    def _screenshot_rects(harvested, frame_ox, frame_oy, dpr, scroll_x, scroll_y, origin_x, origin_y):
+        """Map viewport CSS rects to (sx, sy, sw, sh) screenshot pixels as an (N, 4) int array."""
+        css = np.array(
+            [[m.get("x", 0) or 0, m.get("y", 0) or 0, m.get("w", 0) or 0, m.get("h", 0) or 0] for m in harvested],
+            dtype=np.float64,
+        )
+        rects = np.empty((len(harvested), 4), dtype=np.int64)
+        rects[:, 0] = ((css[:, 0] + frame_ox + scroll_x) * dpr).astype(np.int64) - origin_x
+        rects[:, 1] = ((css[:, 1] + frame_oy + scroll_y) * dpr).astype(np.int64) - origin_y
+        rects[:, 2] = (css[:, 2] * dpr).astype(np.int64)
+        rects[:, 3] = (css[:, 3] * dpr).astype(np.int64)
+        # Tiny CSS boxes (< 8px) are decorative or hidden; flag them with a zero size.
+        tiny = (css[:, 2] < 8) | (css[:, 3] < 8)
+        rects[tiny, 2:] = 0
+        return rects
+
+    @staticmethod
+    def _visible_rect_mask(rects, img_w, img_h):
+        """Boolean mask of rects that have a size and overlap the screenshot."""
+        keep = (rects[:, 2] > 0) & (rects[:, 3] > 0)
+        if img_w is not None and img_h is not None:
+            keep &= (
+                (rects[:, 0] + rects[:, 2] > 0)
+                & (rects[:, 1] + rects[:, 3] > 0)
+                & (rects[:, 0] < img_w)
+                & (rects[:, 1] < img_h)
+            )
+        return keep
+
+    @staticmethod
+    def _frame_rects(page, iframe_rects=None):
+        """
+        Viewport rect (x, y, w, h) of every frame's host element. The main frame and
+        frames whose host could not be measured get (0, 0, None, None).
+        `iframe_rects` reuses top-level iframe rects already read from the main frame.
+        """
+        rects_by_frame = {page.main_frame: (0.0, 0.0, None, None)}
+        child_frames = [f for f in page.frames if f != page.main_frame]
+        if not child_frames:
+            return rects_by_frame
+
+        # One evaluate for every top-level iframe rect instead of two round-trips per frame.
+        rects = iframe_rects
+        if rects is None:
             try:
-                el = frame.frame_element()
-                b = el.bounding_box()
-                if b:
-                    offsets[frame] = (float(b.get("x", 0)), float(b.get("y", 0)))
-                else:
-                    offsets[frame] = (0.0, 0.0)
+                rects = page.evaluate(_IFRAME_RECTS_JS) or []
             except Exception:
-                offsets[frame] = (0.0, 0.0)
-        return offsets
+                rects = []
+        by_name = {}
+        by_src = {}
+        for r in rects:
+            rect = (
+                float(r.get("x", 0) or 0),
+                float(r.get("y", 0) or 0),
+                float(r.get("w", 0) or 0),
+                float(r.get("h", 0) or 0),
+            )
+            if r.get("name"):
+                by_name.setdefault(r["name"], []).append(rect)
+            if r.get("src"):
+                by_src.setdefault(r["src"], []).append(rect)
+
+        for frame in child_frames:
+            rect = None
+            if frame.parent_frame == page.main_frame:
+                if frame.name and by_name.get(frame.name):
+                    rect = by_name[frame.name].pop(0)
+                elif frame.url and by_src.get(frame.url):
+                    rect = by_src[frame.url].pop(0)
+            # Nested or unmatched frames still need their own frame_element lookup.
+            rects_by_frame[frame] = rect if rect is not None else DOMMapper._frame_element_rect(frame)
+        return rects_by_frame
+
+    @staticmethod
+    def _frame_element_rect(frame):
+        try:
+            el = frame.frame_element()
+            b = el.bounding_box()
+            if b is None:
+                # Host element is not rendered (display:none etc.).
+                return (0.0, 0.0, 0.0, 0.0)
+            return (float(b.get("x", 0)), float(b.get("y", 0)), float(b.get("width", 0)), float(b.get("height", 0)))
+        except Exception:
+            return (0.0, 0.0, None, None)
 
     @staticmethod
     def _frame_path(frame, page):
@@ -464,11 +704,10 @@ class DOMMapper:
 
     @staticmethod
     def _overlaps_image(sx, sy, sw, sh, img_w, img_h):
+        # Per-item filtering is vectorized in _visible_rect_mask; this scalar form serves frame rects.
         if img_w is None or img_h is None:
             return True
-        if sx + sw <= 0 or sy + sh <= 0 or sx >= img_w or sy >= img_h:
-            return False
-        return True
+        return sx + sw > 0 and sy + sh > 0 and sx < img_w and sy < img_h
 
     @staticmethod
     def _element_key(dom_info):
@@ -481,31 +720,23 @@ class DOMMapper:
         )
 
     @staticmethod
-    def _deduplicate_detections(detections, iou_threshold=0.3):
-        """Each detection is (x,y,w,h,payload)."""
-        if not detections:
+    def _deduplicate_detections(boxes, payloads, iou_threshold=0.3):
+        """
+        NMS over an (N, 4) float32 array of (x, y, w, h) rows with a parallel payload list.
+        Returns indices of the kept detections, largest area first.
+        """
+        if len(payloads) == 0:
             return []
 
-        boxes = np.array([[d[0], d[1], d[0] + d[2], d[1] + d[3]] for d in detections], dtype=float)
-        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
-        idxs = np.argsort(areas)[::-1]
-        keep = []
-
-        while idxs.size > 0:
-            i = int(idxs[0])
-            keep.append(i)
-            if idxs.size == 1:
-                break
-
-            xx1 = np.maximum(boxes[i, 0], boxes[idxs[1:], 0])
-            yy1 = np.maximum(boxes[i, 1], boxes[idxs[1:], 1])
-            xx2 = np.minimum(boxes[i, 2], boxes[idxs[1:], 2])
-            yy2 = np.minimum(boxes[i, 3], boxes[idxs[1:], 3])
-
-            w = np.maximum(0, xx2 - xx1)
-            h = np.maximum(0, yy2 - yy1)
-            intersection = w * h
-            iou = intersection / (areas[i] + areas[idxs[1:]] - intersection + 1e-6)
-            idxs = idxs[1:][iou < iou_threshold]
-
-        return [detections[i] for i in keep]
+        x1 = np.ascontiguousarray(boxes[:, 0])
+        y1 = np.ascontiguousarray(boxes[:, 1])
+        x2 = x1 + boxes[:, 2]
+        y2 = y1 + boxes[:, 3]
+        areas = (x2 - x1) * (y2 - y1)
+
+        if _nms_numba is not None:
+            keep = _nms_numba(x1, y1, x2, y2, areas, np.float32(iou_threshold))
+        else:
+            keep = _nms_numpy(x1, y1, x2, y2, areas, iou_threshold)
+
+        return [int(i) for i in keep]
@@ -2,34 +2,101 @@
 Field classification with captcha handling.
 Pipeline: keywords -> HTML attrs -> fuzzy -> MiniLM (semantic) -> fuzzy fallback -> log unknown.
 """
+import atexit
+import functools
+import json
 import logging
 import os
 import re
+import time
 from datetime import datetime
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 
-from core.semantic_classifier import classify_semantic
+from core.semantic_classifier import classify_semantic, classify_semantic_batch
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; falls back to the stdlib json encoder
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; plain substring scans are used instead
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
 UNKNOWN_PATTERNS_LOG = os.path.join("logs", "unknown_patterns.jsonl")
+# The unknown-patterns log is flushed after this many entries or seconds, whichever comes first.
+UNKNOWN_LOG_FLUSH_EVERY = 32
+UNKNOWN_LOG_FLUSH_SECONDS = 5.0
+
+_NORMALIZE_RE = re.compile(r"[_\-\./]+")
+_TOKEN_RE = re.compile(r"[_\-\s\.]+")
+# Attributes joined (in this order) into the blob keyword/fuzzy matching runs on.
+_BLOB_ATTRS = ("name", "id", "placeholder", "aria-label", "label_text", "nearby_text", "class")
+# Attribute-only fallback (step 4b): token -> (priority, field, confidence).
+_TOKEN_TO_FIELD = {
+    "name": (0, "name", 75),
+    "email": (1, "email", 80), "mail": (1, "email", 80),
+    "phone": (2, "phone", 80), "tel": (2, "phone", 80), "mobile": (2, "phone", 80),
+    "company": (3, "company", 80), "organization": (3, "company", 80), "business": (3, "company", 80),
+    "message": (4, "message", 75), "comment": (4, "message", 75),
+    "inquiry": (4, "message", 75), "details": (4, "message", 75),
+}
+_NAME_EXCLUDE = frozenset({"first", "last", "surname", "given", "family"})
 os.makedirs("logs", exist_ok=True)
 
+_unknown_log_fh = None
+_unknown_log_pending = 0
+_unknown_log_flushed_at = 0.0
+
+
+def _unknown_log():
+    """Buffered append handle for UNKNOWN_PATTERNS_LOG, opened once and closed at exit."""
+    global _unknown_log_fh, _unknown_log_flushed_at
+    if _unknown_log_fh is None:
+        _unknown_log_flushed_at = time.monotonic()
+        _unknown_log_fh = open(UNKNOWN_PATTERNS_LOG, "ab", buffering=1 << 16)
+        atexit.register(_unknown_log_fh.close)
+    return _unknown_log_fh
+
+
+def flush_unknown_patterns():
+    """Push buffered unknown-pattern entries to disk (pool workers exit without atexit)."""
+    global _unknown_log_pending, _unknown_log_flushed_at
+    if _unknown_log_fh is not None:
+        try:
+            _unknown_log_fh.flush()
+            _unknown_log_pending = 0
+            _unknown_log_flushed_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to flush unknown patterns log: {e}")
+
 
 def _log_unknown_pattern(combined_text, attributes, element_type, enabled=True):
     """Append unknown pattern for iterative improvement."""
+    global _unknown_log_pending
     if not enabled:
         return
     try:
         entry = {
-            "ts": datetime.now().isoformat(),
+            "ts": datetime.now(),
             "combined_text": (combined_text or "")[:500],
             "attributes": {str(k): str(v)[:200] for k, v in (attributes or {}).items()},
             "element_type": element_type,
         }
-        import json
-        with open(UNKNOWN_PATTERNS_LOG, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if orjson is not None:
+            line = orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            entry["ts"] = entry["ts"].isoformat()
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        _unknown_log().write(line)
+        _unknown_log_pending += 1
+        if (_unknown_log_pending >= UNKNOWN_LOG_FLUSH_EVERY
+                or time.monotonic() - _unknown_log_flushed_at >= UNKNOWN_LOG_FLUSH_SECONDS):
+            flush_unknown_patterns()
         logger.debug(f"[UNKNOWN] Logged pattern: {combined_text[:80]}...")
     except Exception as e:
         logger.warning(f"Failed to log unknown pattern: {e}")
@@ -76,120 +143,163 @@ class FieldClassifier:
         Multi-factor classification with fuzzy matching
         Returns: (field_type, confidence)
         """
-        text_lower = (text or "").lower()
-        attrs = {str(k).lower(): str(v).lower() for k, v in (attributes or {}).items() if v}
-        attr_blob_raw = " ".join([
-            attrs.get("name", ""),
-            attrs.get("id", ""),
-            attrs.get("placeholder", ""),
-            attrs.get("aria-label", ""),
-            attrs.get("label_text", ""),
-            attrs.get("nearby_text", ""),
-            attrs.get("class", "")
-        ]).strip()
-        attr_blob = re.sub(r"[_\-\./]+", " ", attr_blob_raw)
-        combined_text = f"{attr_blob} {text_lower}".strip()
-
-        # Hard-stop non-fillable control types before any fuzzy matching.
-        if element_type in ["button"]:
+        if element_type == "button":
             return "submit", 98
+        key = FieldClassifier._normalize_inputs(text, element_type, attributes)
+        field_type, confidence = FieldClassifier._classify_cached(*key, min_confidence, use_minilm)
+        if field_type == "unknown":
+            combined_text = FieldClassifier._classify_fast(*key, min_confidence)[1]
+            _log_unknown_pattern(combined_text, attributes, element_type, enabled=log_unknown)
+        return field_type, confidence
+
+    @staticmethod
+    def classify_batch(items, min_confidence=70, use_minilm=True, log_unknown=True):
+        """
+        Classify many (text, element_type, attributes) items at once.
+        Fields left over by the fast paths share one MiniLM encode call.
+        Returns a list of (field_type, confidence) in input order.
+        """
+        keys = [FieldClassifier._normalize_inputs(*item) for item in items]
+        prepared = [FieldClassifier._classify_fast(*key, min_confidence) for key in keys]
+        semantic = [(None, 0)] * len(items)
+        if use_minilm:
+            pending = [
+                i for i, (resolved, combined_text) in enumerate(prepared)
+                if not resolved and combined_text and keys[i][3] not in ('checkbox', 'radio')
+            ]
+            if pending:
+                batch = classify_semantic_batch([prepared[i][1] for i in pending], min_similarity=0.45)
+                for i, res in zip(pending, batch):
+                    semantic[i] = res
+        results = []
+        for (_, element_type, attributes), key, (resolved, combined_text), sem in zip(items, keys, prepared, semantic):
+            if resolved:
+                results.append(resolved)
+                continue
+            field_type, confidence = FieldClassifier._classify_fallback(combined_text, key[3], element_type, sem)
+            if field_type == "unknown":
+                _log_unknown_pattern(combined_text, attributes, element_type, enabled=log_unknown)
+            results.append((field_type, confidence))
+        return results
+
+    @staticmethod
+    def cache_clear():
+        """Drop memoized classifications (e.g. after FIELD_PATTERNS changes)."""
+        FieldClassifier._classify_cached.cache_clear()
+        FieldClassifier._classify_fast.cache_clear()
+
+    @staticmethod
+    def _normalize_inputs(text, element_type, attributes):
+        """Reduce raw inputs to the hashable key classification depends on."""
+        # Values stay as-is; the joined blob is lowercased once. Playwright already
+        # hands back strings, so str() only runs for the odd non-str value.
+        attrs = {
+            (k if isinstance(k, str) else str(k)).lower(): v if isinstance(v, str) else str(v)
+            for k, v in (attributes or {}).items() if v
+        }
+        attr_blob_raw = " ".join([attrs.get(k, "") for k in _BLOB_ATTRS]).strip().lower()
+        return (text or "").lower(), element_type, attr_blob_raw, attrs.get("type", "").lower()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _classify_cached(text_lower, element_type, attr_blob_raw, attr_type, min_confidence, use_minilm):
+        """Full pipeline minus unknown-pattern logging, memoized on normalized inputs."""
+        resolved, combined_text = FieldClassifier._classify_fast(
+            text_lower, element_type, attr_blob_raw, attr_type, min_confidence
+        )
+        if resolved:
+            return resolved
+        semantic = (None, 0)
+        if use_minilm and combined_text and attr_type not in ('checkbox', 'radio'):
+            semantic = classify_semantic(combined_text, min_similarity=0.45)
+        return FieldClassifier._classify_fallback(combined_text, attr_type, element_type, semantic)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _classify_fast(text_lower, element_type, attr_blob_raw, attr_type, min_confidence):
+        """
+        Steps 1-4b (type, keyword and fuzzy rules).
+        Returns ((field_type, confidence) or None, combined_text).
+        """
+        # Hard-stop non-fillable control types before building any text.
+        if element_type == "button":
+            return ("submit", 98), ""
+
+        attr_blob = _NORMALIZE_RE.sub(" ", attr_blob_raw)
+        combined_text = f"{attr_blob} {text_lower}".strip()
 
-        # 1. Check for captcha first (hard stop)
-        for pattern in FieldClassifier.FIELD_PATTERNS["captcha"]:
-            if pattern in combined_text:
-                return "captcha", 100
+        # 1. Check for captcha first (hard stop). The same keyword pass also finds
+        # the step-3 attribute keyword, since combined_text starts with attr_blob.
+        attr_prefix_len = len(attr_blob.lstrip())
+        captcha_hit, keyword_field = _scan_keywords(combined_text, attr_prefix_len)
+        if captcha_hit:
+            return ("captcha", 100), combined_text
 
         # 2. HTML input type analysis (highest confidence)
-        attr_type = attrs.get("type", "")
         if attr_type:
             if attr_type == 'email':
-                return "email", 95
+                return ("email", 95), combined_text
             elif attr_type in ['tel', 'phone']:
-                return "phone", 95
+                return ("phone", 95), combined_text
             elif attr_type in ['submit', 'button', 'reset']:
-                return "submit", 98
+                return ("submit", 98), combined_text
             elif attr_type in ['file', 'image']:
-                return "file", 98
+                return ("file", 98), combined_text
             elif attr_type in ['search']:
-                return "subject", 70
+                return ("subject", 70), combined_text
             elif attr_type in ['checkbox', 'radio']:
-                return "choice", 95
+                return ("choice", 95), combined_text
 
         # 2a. Native textarea is almost always free-form message/details.
         if element_type == 'textarea':
-            return "message", 95
+            return ("message", 95), combined_text
 
         # 2b. Native select should stay select/dropdown and not be hijacked
         # by option text (e.g., "Email" in a "How did you hear" menu).
         if element_type == 'select':
-            return "dropdown", 95
+            return ("dropdown", 95), combined_text
 
         # 3. Attribute keyword matching (very reliable for forms)
         if ("full name" in attr_blob) or ("your name" in attr_blob and "first name" not in attr_blob):
-            return "name", 92
+            return ("name", 92), combined_text
 
-        for field, patterns in FieldClassifier.FIELD_PATTERNS.items():
-            for pattern in patterns:
-                if pattern in attr_blob:
-                    return field, 90
+        if keyword_field:
+            return (keyword_field, 90), combined_text
 
         # 4. Fuzzy matching on combined OCR + attributes (lower threshold for attribute-heavy text)
-        attr_weight = 1 if attr_blob_raw.strip() else 0
+        attr_weight = 1 if attr_blob_raw else 0  # blob is already stripped
         effective_min = min(60, min_confidence) if attr_weight else min_confidence
         if combined_text and attr_type not in ['checkbox', 'radio']:
-            best_match = None
-            best_score = 0
-
-            for field, patterns in FieldClassifier.FIELD_PATTERNS.items():
-                if field in ("captcha", "choice"):
-                    continue
-                for pattern in patterns:
-                    score = max(
-                        fuzz.partial_ratio(pattern, combined_text),
-                        fuzz.token_set_ratio(pattern, combined_text)
-                    )
-                    if score > best_score and score >= effective_min:
-                        best_score = score
-                        best_match = field
-
+            best_match, best_score = FieldClassifier._best_fuzzy_match(combined_text, effective_min)
             if best_match:
-                return best_match, best_score
+                return (best_match, best_score), combined_text
 
         # 4b. Attribute-only fallback: split name/id/placeholder by _ - to catch customer_name, etc.
-        tokens = set(re.split(r"[_\-\s\.]+", attr_blob_raw.lower()))
-        if "name" in tokens and not {"first", "last", "surname", "given", "family"}.intersection(tokens):
-            return "name", 75
-        if "email" in tokens or "mail" in tokens:
-            return "email", 80
-        if "phone" in tokens or "tel" in tokens or "mobile" in tokens:
-            return "phone", 80
-        if "company" in tokens or "organization" in tokens or "business" in tokens:
-            return "company", 80
-        if "message" in tokens or "comment" in tokens or "inquiry" in tokens or "details" in tokens:
-            return "message", 75
+        tokens = set(_TOKEN_RE.split(attr_blob_raw))
+        best = None
+        for token in tokens:
+            hit = _TOKEN_TO_FIELD.get(token)
+            if hit and (best is None or hit[0] < best[0]):
+                if hit[1] == "name" and not _NAME_EXCLUDE.isdisjoint(tokens):
+                    continue
+                best = hit
+        if best:
+            return (best[1], best[2]), combined_text
 
+        return None, combined_text
+
+    @staticmethod
+    def _classify_fallback(combined_text, attr_type, element_type, semantic):
+        """Steps 5-7 given the precomputed MiniLM result for combined_text."""
         # 5. MiniLM semantic classification (before returning unknown)
-        if use_minilm and combined_text and attr_type not in ('checkbox', 'radio'):
-            field_type_sem, conf_sem = classify_semantic(combined_text, min_similarity=0.45)
-            if field_type_sem:
-                return field_type_sem, conf_sem
+        field_type_sem, conf_sem = semantic
+        if field_type_sem:
+            return field_type_sem, conf_sem
 
         # 6. Fuzzy fallback with lower threshold (edge cases)
         FUZZY_FALLBACK_MIN = 50
         if combined_text and attr_type not in ('checkbox', 'radio'):
-            best_match = None
-            best_score = 0
-            for field, patterns in FieldClassifier.FIELD_PATTERNS.items():
-                if field in ("captcha", "choice"):
-                    continue
-                for pattern in patterns:
-                    score = max(
-                        fuzz.partial_ratio(pattern, combined_text),
-                        fuzz.token_set_ratio(pattern, combined_text),
-                    )
-                    if score > best_score and score >= FUZZY_FALLBACK_MIN:
-                        best_score = score
-                        best_match = field
+            best_match, best_score = FieldClassifier._best_fuzzy_match(combined_text, FUZZY_FALLBACK_MIN)
             if best_match:
                 return best_match, best_score
 
@@ -199,10 +309,30 @@ class FieldClassifier:
         elif element_type == 'select':
             return "dropdown", 70
 
-        # 8. Log unknown for iterative improvement
-        _log_unknown_pattern(combined_text, attributes, element_type, enabled=log_unknown)
+        # 8. Unknown (callers log it for iterative improvement)
         return "unknown", 0
 
+    @staticmethod
+    def _best_fuzzy_match(combined_text, min_score):
+        """
+        Best (field, score) by max(partial_ratio, token_set_ratio) over fillable patterns,
+        or (None, 0) when nothing reaches min_score. Each scorer runs over all patterns in
+        one cdist call; ties go to the earliest pattern.
+        """
+        scores = process.cdist(
+            [combined_text], _FUZZY_PATTERN_STRS, scorer=fuzz.partial_ratio,
+            score_cutoff=min_score, dtype=np.float64, workers=1,
+        )[0]
+        np.maximum(scores, process.cdist(
+            [combined_text], _FUZZY_PATTERN_STRS, scorer=fuzz.token_set_ratio,
+            score_cutoff=min_score, dtype=np.float64, workers=1,
+        )[0], out=scores)
+        best = int(np.argmax(scores))
+        best_score = float(scores[best])
+        if best_score <= 0 or best_score < min_score:
+            return None, 0
+        return _FUZZY_PATTERNS[best][0], best_score
+
     @staticmethod
     def should_skip_field(field_type, element_info):
         """
@@ -232,3 +362,60 @@ class FieldClassifier:
             return True
 
         return False
+
+
+def _build_keyword_automaton(field_patterns):
+    """
+    Aho-Corasick automaton over every keyword. Each keyword maps to the ranks
+    (FIELD_PATTERNS order) of all fields that list it.
+    """
+    if ahocorasick is None:
+        return None
+    ranks_by_pattern = {}
+    for rank, patterns in enumerate(field_patterns.values()):
+        for pattern in patterns:
+            ranks_by_pattern.setdefault(pattern, set()).add(rank)
+    automaton = ahocorasick.Automaton()
+    for pattern, ranks in ranks_by_pattern.items():
+        automaton.add_word(pattern, tuple(sorted(ranks)))
+    automaton.make_automaton()
+    return automaton
+
+
+_FIELD_ORDER = list(FieldClassifier.FIELD_PATTERNS)
+_CAPTCHA_RANK = _FIELD_ORDER.index("captcha")
+
+# (field, pattern) pairs scored by fuzzy matching, in FIELD_PATTERNS order.
+_FUZZY_PATTERNS = [
+    (field, pattern)
+    for field, patterns in FieldClassifier.FIELD_PATTERNS.items()
+    if field not in ("captcha", "choice")
+    for pattern in patterns
+]
+_FUZZY_PATTERN_STRS = [pattern for _, pattern in _FUZZY_PATTERNS]
+_KEYWORD_AUTOMATON = _build_keyword_automaton(FieldClassifier.FIELD_PATTERNS)
+
+
+def _scan_keywords(text, prefix_len):
+    """
+    One pass over text for keywords. Returns (captcha_hit, field), where field is the
+    first field (in FIELD_PATTERNS order) with a keyword inside text[:prefix_len].
+    """
+    if not text:
+        return False, None
+    if _KEYWORD_AUTOMATON is not None:
+        best = None
+        for end, ranks in _KEYWORD_AUTOMATON.iter(text):
+            if _CAPTCHA_RANK in ranks:
+                return True, None
+            if end < prefix_len and (best is None or ranks[0] < best):
+                best = ranks[0]
+        return False, (_FIELD_ORDER[best] if best is not None else None)
+    if any(pattern in text for pattern in FieldClassifier.FIELD_PATTERNS["captcha"]):
+        return True, None
+    prefix = text[:prefix_len]
+    for field, patterns in FieldClassifier.FIELD_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in prefix:
+                return False, field
+    return False, None
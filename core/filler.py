@@ -1,12 +1,53 @@
 """
 Form field filling logic
 """
-import time
 import re
 
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def _format_phone(digits):
+    digits = digits[-10:]
+    if len(digits) == 10:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    return digits
+
+
+def _format_date(digits):
+    if len(digits) >= 8:
+        return f"{digits[:2]}/{digits[2:4]}/{digits[4:8]}"
+    return digits
+
+
+# Input mask type -> digits formatter used by handle_input_mask.
+_MASK_FORMATTERS = {
+    "phone": _format_phone,
+    "date": _format_date,
+    "ssn": str,
+    "zip": str,
+}
+
+_COMMIT_VALUE_JS = """
+el => {
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+"""
+
+_OPTIONS_JS = """
+el => Array.from(el.querySelectorAll('option'), o => [
+    (o.textContent || '').trim(),
+    (o.getAttribute('value') || '').trim(),
+])
+"""
+
 class FormFiller:
     def __init__(self, page):
         self.page = page
+        # (frame, frame url, selector, xpath) -> Locator that matched. Lives as long as this
+        # filler (one URL run); a navigated or re-attached frame changes the key, so no
+        # page listeners are needed to invalidate it.
+        self._locator_cache = {}
 
     def fill_field(self, element_info, value):
         """
@@ -34,17 +75,15 @@ class FormFiller:
                     locator.check(timeout=4000)
                 else:
                     locator.click(timeout=4000)
-                time.sleep(0.2)
                 return True
 
             if dom_type == 'select':
                 if self._select_option(locator, value):
-                    time.sleep(0.2)
                     return True
                 return False
 
-            # Check for contenteditable (rich text editors)
-            is_contenteditable = locator.evaluate(
+            # Check for contenteditable (rich text editors); native text controls never need it.
+            is_contenteditable = dom_type not in ('input', 'textarea') and locator.evaluate(
                 "el => el.isContentEditable || el.getAttribute('contenteditable') === 'true'"
             )
             if is_contenteditable:
@@ -88,8 +127,11 @@ class FormFiller:
                 if not filled:
                     return False
 
-            # Small delay to ensure typing is complete
-            time.sleep(0.3)
+            # Notify framework listeners (React/Vue) synchronously instead of sleeping.
+            try:
+                locator.evaluate(_COMMIT_VALUE_JS, timeout=2000)
+            except Exception:
+                pass
 
             return True
 
@@ -114,6 +156,16 @@ class FormFiller:
                     context = fr
                     break
 
+        key = (context, context.url, selector, xpath)
+        cached = self._locator_cache.get(key)
+        if cached is not None:
+            return cached
+        loc = self._find_locator(context, selector, xpath)
+        if loc is not None:
+            self._locator_cache[key] = loc
+        return loc
+
+    def _find_locator(self, context, selector, xpath):
         if selector:
             try:
                 loc = context.locator(selector).first
@@ -145,18 +197,17 @@ class FormFiller:
         except Exception:
             pass
         try:
-            options = locator.locator("option")
-            count = options.count()
+            # One round-trip for every option's label/value instead of 1 + 2N locator calls.
+            options = locator.evaluate(_OPTIONS_JS, timeout=5000)
             best_value = None
             target = value_str.lower()
-            for i in range(count):
-                opt = options.nth(i)
-                opt_label = (opt.text_content(timeout=1000) or "").strip()
-                opt_value = (opt.get_attribute("value", timeout=1000) or "").strip()
-                if opt_label.lower() == target or opt_value.lower() == target:
+            for opt_label, opt_value in options:
+                label_lower = opt_label.lower()
+                value_lower = opt_value.lower()
+                if label_lower == target or value_lower == target:
                     best_value = opt_value or opt_label
                     break
-                if target in opt_label.lower() or target in opt_value.lower():
+                if target in label_lower or target in value_lower:
                     best_value = opt_value or opt_label
             if best_value is not None:
                 locator.select_option(value=best_value, timeout=5000)
@@ -179,7 +230,7 @@ class FormFiller:
             pass
         # Fallback to digits-only for strict masks.
         try:
-            digits = re.sub(r"\D", "", raw)
+            digits = _NON_DIGIT_RE.sub("", raw)
             if not digits:
                 return False
             locator.click(timeout=3000)
@@ -192,17 +243,12 @@ class FormFiller:
 
     def handle_input_mask(self, locator, value, mask_type):
         """Handle common masks (phone/date/zip/ssn) before generic typing."""
-        masks = {
-            "phone": r"(\d{3})(\d{3})(\d{4})",
-            "date": r"(\d{2})(\d{2})(\d{4})",
-            "ssn": r"(\d{3})(\d{2})(\d{4})",
-            "zip": r"(\d{5})(\d{4})?",
-        }
-        if mask_type not in masks:
+        formatter = _MASK_FORMATTERS.get(mask_type)
+        if formatter is None:
             return False
 
         raw = str(value or "").strip()
-        digits = re.sub(r"\D", "", raw)
+        digits = _NON_DIGIT_RE.sub("", raw)
         if not digits:
             return False
 
@@ -210,22 +256,7 @@ class FormFiller:
             locator.click(timeout=3000)
             locator.press("Control+A", timeout=2000)
             locator.press("Delete", timeout=2000)
-
-            if mask_type == "phone":
-                digits = digits[-10:]
-                if len(digits) == 10:
-                    formatted = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
-                    locator.type(formatted, delay=35, timeout=5000)
-                    return True
-                locator.type(digits, delay=35, timeout=5000)
-                return True
-
-            if mask_type == "date" and len(digits) >= 8:
-                formatted = f"{digits[:2]}/{digits[2:4]}/{digits[4:8]}"
-                locator.type(formatted, delay=35, timeout=5000)
-                return True
-
-            locator.type(digits, delay=35, timeout=5000)
+            locator.type(formatter(digits), delay=35, timeout=5000)
             return True
         except Exception:
             return False
@@ -1,24 +1,84 @@
 """
 Text extraction with confidence scoring
 """
+import os
+import threading
 import pytesseract
 import cv2
 import numpy as np
 from pytesseract import Output
 
+# Tesseract's OpenMP threading is slower than one thread per process; must be set
+# before libtesseract loads (and is inherited by pytesseract subprocesses).
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr is optional; pytesseract (subprocess) is used instead
+    tesserocr = None
+
+# Widest field ROI fed to Tesseract; wider regions are downsampled first. Only the
+# width is capped, and whole-image OCR is never scaled, so tall full-page captures
+# keep legible text.
+MAX_OCR_WIDTH = 1200
+
+
+def decode_image_bytes(png_bytes):
+    """Decode PNG/JPEG bytes to a BGR array without touching disk (None on failure)."""
+    if not png_bytes:
+        return None
+    return cv2.imdecode(np.frombuffer(png_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _ascii_mask(text):
+    """Bitmask with bit c set for every ASCII code point c in text."""
+    mask = 0
+    for c in text.encode("ascii"):
+        mask |= 1 << c
+    return mask
+
+
 class TextExtractor:
     def __init__(self, lang='eng', min_confidence=50):
         self.lang = lang
         self.min_confidence = min_confidence
+        # In-process Tesseract (psm 6) reused across calls; None -> pytesseract subprocess.
+        self._api = None
+        if tesserocr is not None:
+            try:
+                self._api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_BLOCK)
+            except Exception:
+                self._api = None
+        # (path, mtime_ns, size) -> decoded image of the last screenshot read.
+        self._image_cache = None
+        # (image, words) from the last whole-page OCR pass; see extract_page_words.
+        self._page_words = None
+        # PyTessBaseAPI is not re-entrant; the warm-up thread shares it.
+        self._api_lock = threading.Lock()
+        if not os.environ.get("FORM_FILLER_NO_WARMUP"):
+            threading.Thread(target=self._warm_up, name="ocr-warmup", daemon=True).start()
+
+    def _warm_up(self):
+        """Run a tiny OCR so Tesseract loads its language data before the first field."""
+        try:
+            self._ocr_words(np.full((32, 32), 255, dtype=np.uint8))
+        except Exception:
+            pass
 
     def extract_with_context(self, image_path, target_box, context_margin=50):
         """
         Extract text with confidence filtering
+        image_path may also be an already-decoded BGR array; target_box=None
+        means the whole image.
         Returns: (text, confidence_score)
         """
-        img = cv2.imread(image_path)
+        img = self._load_image(image_path)
         if img is None:
             return "", 0
+        img_h, img_w = img.shape[:2]
+        whole_image = target_box is None
+        if whole_image:
+            target_box, context_margin = (0, 0, img_w, img_h), 0
 
         # Ensure integer indices (DOM bounding_box returns floats)
         x, y, w, h = (int(v) for v in target_box)
@@ -26,40 +86,117 @@ class TextExtractor:
         # Expand area for context
         x1 = max(0, x - context_margin)
         y1 = max(0, y - context_margin)
-        x2 = min(img.shape[1], x + w + context_margin)
-        y2 = min(img.shape[0], y + h + context_margin)
+        x2 = min(img_w, x + w + context_margin)
+        y2 = min(img_h, y + h + context_margin)
 
         roi = img[y1:y2, x1:x2]
-        processed = self._preprocess_image(roi)
+        processed = self._preprocess_image(roi, downscale=not whole_image)
 
         # Get OCR data with confidence
-        data = pytesseract.image_to_data(
-            processed,
-            config=f"--psm 6 -l {self.lang}",
-            output_type=Output.DICT
-        )
-
-        # Filter by confidence
-        texts = []
-        confidences = []
+        data = self._ocr_words(processed)
 
-        for i in range(len(data['text'])):
-            conf = int(data['conf'][i])
-            text = data['text'][i].strip()
+        # Filter by confidence (int() truncation, as tesseract reports whole or float scores)
+        conf_arr = np.asarray(data['conf'], dtype=np.float64).astype(np.int64)
+        text_arr = np.array([t.strip() for t in data['text']], dtype=object)
+        mask = (conf_arr > self.min_confidence) & text_arr.astype(bool)
 
-            if conf > self.min_confidence and text:
-                texts.append(text)
-                confidences.append(conf)
-
-        if not texts:
+        if not mask.any():
             return "", 0
 
         # Weight texts by confidence
-        weighted_text = ' '.join(texts)
-        avg_confidence = sum(confidences) / len(confidences)
+        weighted_text = ' '.join(text_arr[mask])
+        avg_confidence = float(conf_arr[mask].mean())
 
         return weighted_text.lower(), avg_confidence
 
+    def extract_from_page(self, image_path, target_box, context_margin=50):
+        """
+        extract_with_context answered from one whole-page OCR pass (extract_page_words):
+        words whose centre falls in the box plus margin, same confidence filtering.
+        Returns: (text, confidence_score)
+        """
+        return self.extract_from_page_batch(image_path, [target_box], context_margin)[0]
+
+    def extract_from_page_batch(self, image_path, target_boxes, context_margin=50):
+        """extract_from_page for many boxes; word-in-box tests run as one (boxes x words) mask."""
+        words = self.extract_page_words(image_path)
+        if not words or not len(target_boxes):
+            return [("", 0)] * len(target_boxes)
+
+        boxes = np.asarray([[int(v) for v in box] for box in target_boxes], dtype=np.float64)
+        x1 = boxes[:, 0:1] - context_margin
+        y1 = boxes[:, 1:2] - context_margin
+        x2 = boxes[:, 0:1] + boxes[:, 2:3] + context_margin
+        y2 = boxes[:, 1:2] + boxes[:, 3:4] + context_margin
+        cx, cy = words['cx'][None, :], words['cy'][None, :]
+        inside = words['valid'][None, :] & (cx >= x1) & (cx < x2) & (cy >= y1) & (cy < y2)
+
+        results = []
+        for row in inside:
+            if not row.any():
+                results.append(("", 0))
+                continue
+            results.append((' '.join(words['text'][row]).lower(), float(words['conf'][row].mean())))
+        return results
+
+    def extract_page_words(self, image_path):
+        """
+        Word-level OCR of the whole screenshot in a single Tesseract pass, reused
+        for every box on the same image. None if the image or OCR is unavailable.
+        """
+        img = self._load_image(image_path)
+        if img is None:
+            return None
+        if self._page_words is not None and self._page_words[0] is img:
+            return self._page_words[1]
+
+        words = None
+        try:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            data = self._ocr_page_words(thresh)
+            conf = np.asarray(data['conf'], dtype=np.float64).astype(np.int64)
+            text = np.array([t.strip() for t in data['text']], dtype=object)
+            left = np.asarray(data['left'], dtype=np.float64)
+            top = np.asarray(data['top'], dtype=np.float64)
+            words = {
+                'text': text,
+                'conf': conf,
+                'valid': (conf > self.min_confidence) & text.astype(bool),
+                'cx': left + np.asarray(data['width'], dtype=np.float64) / 2.0,
+                'cy': top + np.asarray(data['height'], dtype=np.float64) / 2.0,
+            }
+        except Exception:
+            words = None
+        # Failures are cached too, so a broken OCR setup costs one attempt per image.
+        self._page_words = (img, words)
+        return words
+
+    def extract_with_context_bytes(self, png_bytes, target_box, context_margin=50):
+        """extract_with_context on in-memory screenshot bytes (e.g. from page.screenshot())."""
+        img = decode_image_bytes(png_bytes)
+        if img is None:
+            return "", 0
+        return self.extract_with_context(img, target_box, context_margin=context_margin)
+
+    def _load_image(self, image_path):
+        """
+        Decoded screenshot, reused while the file is unchanged: every field on a
+        screenshot (and its verification) shares one PNG decode.
+        """
+        if isinstance(image_path, np.ndarray):
+            return image_path
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        key = (image_path, st.st_mtime_ns, st.st_size)
+        if self._image_cache is not None and self._image_cache[0] == key:
+            return self._image_cache[1]
+        img = cv2.imread(image_path)
+        self._image_cache = (key, img) if img is not None else None
+        return img
+
     def verify_fill(self, image_path, box, expected_value, min_match_threshold=0.7):
         """
         Verify field fill using fuzzy matching
@@ -78,25 +215,89 @@ class TextExtractor:
             return True
 
         # Calculate character overlap
-        expected_chars = set(expected_lower.replace(' ', ''))
-        extracted_chars = set(extracted_lower.replace(' ', ''))
+        expected_compact = expected_lower.replace(' ', '')
+        extracted_compact = extracted_lower.replace(' ', '')
+        if not expected_compact or not extracted_compact:
+            return False
 
-        if expected_chars and extracted_chars:
-            overlap = len(expected_chars.intersection(extracted_chars)) / len(expected_chars)
-            return overlap >= min_match_threshold
+        if expected_compact.isascii() and extracted_compact.isascii():
+            # 128-bit character sets: one AND plus popcounts instead of set hashing
+            expected_mask = _ascii_mask(expected_compact)
+            shared = bin(expected_mask & _ascii_mask(extracted_compact)).count("1")
+            overlap = shared / bin(expected_mask).count("1")
+        else:
+            expected_chars = set(expected_compact)
+            overlap = len(expected_chars.intersection(extracted_compact)) / len(expected_chars)
+        return overlap >= min_match_threshold
 
-        return False
+    def _ocr_words(self, processed):
+        """Word-level OCR of a grayscale image as {'text': [...], 'conf': [...]}."""
+        if self._api is not None:
+            try:
+                with self._api_lock:
+                    return self._ocr_words_api(processed)
+            except Exception:
+                pass
+        return pytesseract.image_to_data(
+            processed,
+            config=f"--psm 6 -l {self.lang}",
+            output_type=Output.DICT
+        )
 
-    def _preprocess_image(self, image):
+    def _ocr_page_words(self, processed):
+        """Sparse-text OCR of a full page with word boxes: text, conf, left, top, width, height."""
+        if self._api is not None:
+            try:
+                with self._api_lock:
+                    self._api.SetPageSegMode(tesserocr.PSM.SPARSE_TEXT)
+                    try:
+                        return self._ocr_words_api(processed, with_boxes=True)
+                    finally:
+                        self._api.SetPageSegMode(tesserocr.PSM.SINGLE_BLOCK)
+            except Exception:
+                pass
+        return pytesseract.image_to_data(
+            processed,
+            config=f"--psm 11 -l {self.lang}",
+            output_type=Output.DICT
+        )
+
+    def _ocr_words_api(self, processed, with_boxes=False):
+        """Word-level OCR through the in-process tesserocr API (caller holds _api_lock)."""
+        h, w = processed.shape[:2]
+        self._api.SetImageBytes(np.ascontiguousarray(processed).tobytes(), w, h, 1, w)
+        self._api.Recognize()
+        data = {'text': [], 'conf': []}
+        if with_boxes:
+            data.update(left=[], top=[], width=[], height=[])
+        level = tesserocr.RIL.WORD
+        iterator = self._api.GetIterator()
+        if iterator is None:  # nothing recognized
+            return data
+        for word in tesserocr.iterate_level(iterator, level):
+            data['text'].append(word.GetUTF8Text(level) or "")
+            data['conf'].append(word.Confidence(level))
+            if with_boxes:
+                x1, y1, x2, y2 = word.BoundingBox(level) or (0, 0, 0, 0)
+                data['left'].append(x1)
+                data['top'].append(y1)
+                data['width'].append(x2 - x1)
+                data['height'].append(y2 - y1)
+        return data
+
+    def _preprocess_image(self, image, downscale=True):
         """Preprocess image for better OCR"""
         # Convert to grayscale
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-        # Apply threshold to get binary image
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Over-wide context regions are shrunk before thresholding; text stays legible.
+        if downscale:
+            w = gray.shape[1]
+            scale = min(1.0, MAX_OCR_WIDTH / max(w, 1))
+            if scale < 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-        # Noise removal
-        kernel = np.ones((1, 1), np.uint8)
-        opening = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)
+        # Apply threshold to get binary image (no morphology: a 1x1 open is a no-op)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-        return opening
+        return thresh
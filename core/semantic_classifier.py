@@ -3,9 +3,16 @@ MiniLM-based semantic field classification.
 Lazy-loads model for lightweight CPU usage.
 """
 import logging
+import os
+import threading
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+MINILM_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Dynamic INT8 export of MiniLM (see build_onnx_int8); used instead of torch when present.
+MINILM_ONNX_DIR = os.path.join("models", "minilm-int8")
+
 # Canonical descriptions for each field type (used for embedding similarity)
 FIELD_DESCRIPTIONS = {
     "first_name": "first name given name",
@@ -24,34 +31,130 @@ FILLABLE_TYPES = list(FIELD_DESCRIPTIONS.keys())
 
 _model = None
 _embeddings_cache = None
+# Guards lazy loading so the warm-up thread and the first classification load once.
+_load_lock = threading.RLock()
+# Stripped query text -> (best field index, cosine), most recently used last.
+_query_cache = OrderedDict()
+_QUERY_CACHE_SIZE = 512
+
+
+class _OnnxEncoder:
+    """MiniLM on ONNX Runtime with the SentenceTransformer encode() interface (mean pooling)."""
+
+    def __init__(self, model_dir):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=256)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        import numpy as np
+        out = []
+        for start in range(0, len(texts), batch_size):
+            encs = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            ids = np.array([e.ids for e in encs], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encs], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            out.append(pooled.astype(np.float32))
+        emb = np.concatenate(out) if out else np.zeros((0, 384), dtype=np.float32)
+        if normalize_embeddings:
+            emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-9
+        return emb
+
+
+def build_onnx_int8(out_dir=MINILM_ONNX_DIR):
+    """Export MiniLM to ONNX and quantize weights to INT8 (needs optimum + onnxruntime)."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+
+    fp32_dir = out_dir + "-fp32"
+    ORTModelForFeatureExtraction.from_pretrained(MINILM_MODEL_NAME, export=True).save_pretrained(fp32_dir)
+    AutoTokenizer.from_pretrained(MINILM_MODEL_NAME).save_pretrained(out_dir)
+    quantize_dynamic(
+        os.path.join(fp32_dir, "model.onnx"),
+        os.path.join(out_dir, "model.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+    logger.info(f"Quantized MiniLM written to {out_dir}")
+    return out_dir
 
 
 def _get_model():
     global _model
-    if _model is None:
+    if _model is not None:
+        return _model
+    with _load_lock:
+        if _model is None:
+            _model = _load_model()
+    return _model
+
+
+def _load_model():
+    if os.path.exists(os.path.join(MINILM_ONNX_DIR, "model.onnx")):
         try:
-            from sentence_transformers import SentenceTransformer
-            _model = SentenceTransformer("all-MiniLM-L6-v2")
-            logger.info("MiniLM model loaded for semantic classification")
+            model = _OnnxEncoder(MINILM_ONNX_DIR)
+            logger.info("MiniLM INT8 (ONNX Runtime) loaded for semantic classification")
+            return model
         except Exception as e:
-            logger.warning(f"MiniLM not available, semantic classification disabled: {e}")
-    return _model
+            logger.warning(f"ONNX MiniLM unavailable, falling back to sentence-transformers: {e}")
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+        logger.info("MiniLM model loaded for semantic classification")
+        return model
+    except Exception as e:
+        logger.warning(f"MiniLM not available, semantic classification disabled: {e}")
+    return None
 
 
 def _get_embeddings():
+    """(n_fields, dim) float32 matrix of unit-norm field centroids, built once."""
     global _embeddings_cache
     if _embeddings_cache is not None:
         return _embeddings_cache
-    model = _get_model()
-    if model is None:
-        return None
-    try:
-        texts = [FIELD_DESCRIPTIONS[ft] for ft in FILLABLE_TYPES]
-        _embeddings_cache = model.encode(texts)
-        return _embeddings_cache
-    except Exception as e:
-        logger.warning(f"Failed to cache embeddings: {e}")
+    with _load_lock:
+        if _embeddings_cache is not None:
+            return _embeddings_cache
+        model = _get_model()
+        if model is None:
+            return None
+        try:
+            import numpy as np
+            texts = [FIELD_DESCRIPTIONS[ft] for ft in FILLABLE_TYPES]
+            _embeddings_cache = np.ascontiguousarray(
+                model.encode(texts, normalize_embeddings=True), dtype=np.float32
+            )
+            return _embeddings_cache
+        except Exception as e:
+            logger.warning(f"Failed to cache embeddings: {e}")
+            return None
+
+
+def warm_up():
+    """
+    Load MiniLM and the field centroids in a daemon thread so the first form does
+    not wait on it. Disabled when FORM_FILLER_NO_WARMUP is set (e.g. in CI).
+    """
+    if os.environ.get("FORM_FILLER_NO_WARMUP"):
         return None
+    thread = threading.Thread(target=_get_embeddings, name="minilm-warmup", daemon=True)
+    thread.start()
+    return thread
 
 
 def classify_semantic(combined_text, min_similarity=0.45):
@@ -59,25 +162,43 @@ def classify_semantic(combined_text, min_similarity=0.45):
     Classify field using MiniLM cosine similarity.
     Returns (field_type, confidence) or (None, 0) if no match.
     """
-    if not combined_text or not combined_text.strip():
-        return None, 0
+    return classify_semantic_batch([combined_text], min_similarity=min_similarity)[0]
+
+
+def classify_semantic_batch(texts, min_similarity=0.45):
+    """
+    Classify many fields with a single MiniLM encode call.
+    Returns one (field_type, confidence) or (None, 0) per input text.
+    """
+    results = [(None, 0)] * len(texts)
+    queries = [(t or "").strip()[:512] for t in texts]
+    pending = [i for i, q in enumerate(queries) if q]
+    if not pending:
+        return results
     model = _get_model()
     if model is None:
-        return None, 0
+        return results
     embeddings = _get_embeddings()
     if embeddings is None:
-        return None, 0
+        return results
     try:
         import numpy as np
-        query_emb = model.encode([combined_text.strip()[:512]])[0]
-        # Cosine similarity (embeddings are L2-normalized by default)
-        sims = np.dot(embeddings, query_emb) / (
-            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_emb) + 1e-9
-        )
-        best_idx = int(np.argmax(sims))
-        best_sim = float(sims[best_idx])
-        if best_sim >= min_similarity:
-            return FILLABLE_TYPES[best_idx], min(95, int(best_sim * 100))
+        # Repeat fields (common on multi-step forms) skip the encoder entirely.
+        misses = list(dict.fromkeys(queries[i] for i in pending if queries[i] not in _query_cache))
+        if misses:
+            query_embs = model.encode(misses, batch_size=32, normalize_embeddings=True)
+            # Cosine similarity: both sides are unit-norm, so one GEMM scores every field
+            sims = np.asarray(query_embs, dtype=np.float32) @ embeddings.T
+            best_idx = sims.argmax(axis=1)
+            for row, query in enumerate(misses):
+                _query_cache[query] = (int(best_idx[row]), float(sims[row, best_idx[row]]))
+        for i in pending:
+            best, best_sim = _query_cache[queries[i]]
+            _query_cache.move_to_end(queries[i])
+            if best_sim >= min_similarity:
+                results[i] = (FILLABLE_TYPES[best], min(95, int(best_sim * 100)))
+        while len(_query_cache) > _QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
     except Exception as e:
         logger.debug(f"Semantic classification failed: {e}")
-    return None, 0
+    return results
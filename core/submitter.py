@@ -4,6 +4,137 @@ Form submission handling
 import re
 import time
 
+_SUBMIT_LABELS = [
+    "Submit", "Send", "submit", "send",
+    "Get in Touch", "Contact Us", "Send Message", "Request Quote",
+    "Apply", "Register", "Sign Up", "Subscribe", "Submit Form"
+]
+_FORM_BUTTON_LABELS = ["Submit", "Send", "Get in Touch", "Contact Us", "Send Message"]
+
+
+def _label_patterns(labels):
+    """Case-insensitive name patterns in label priority order (case-only duplicates dropped)."""
+    seen = set()
+    patterns = []
+    for label in labels:
+        if label.lower() not in seen:
+            seen.add(label.lower())
+            patterns.append(re.compile(re.escape(label), re.I))
+    return tuple(patterns)
+
+
+# Accessible-name patterns for role-based submit lookup (strategies 2 and 3). Tried one
+# label at a time: the earliest label wins, not the earliest matching button in the DOM.
+_SUBMIT_LABEL_PATTERNS = _label_patterns(_SUBMIT_LABELS)
+_FORM_BUTTON_PATTERNS = _label_patterns(_FORM_BUTTON_LABELS)
+_SUBMIT_TEXT_RE = re.compile(r"submit|send|contact|apply|register", re.I)
+
+# Use specific confirmation phrases (avoid overly generic words like "success").
+_SUCCESS_PATTERNS = (
+    re.compile(r"thank(s)?\s+you", re.I),
+    re.compile(r"thanks?\s+for\s+(contacting|reaching out)", re.I),
+    re.compile(r"message\s+(has\s+been\s+)?(sent|submitted)", re.I),
+    re.compile(r"(form|request|application)\s+(has\s+been\s+)?submitted", re.I),
+    re.compile(r"(submission|request)\s+(has\s+been\s+)?received", re.I),
+    re.compile(r"we('ll| will)\s+(be in touch|contact you|reach out)", re.I),
+)
+# Runs strategies 1-4 of find_and_click_submit in one DOM pass per frame. Tags the
+# winning element with data-ff-submit and returns [strategy, rank], or null.
+_FIND_SUBMIT_JS = """
+({labels, formLabels}) => {
+    const visible = el => {
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    const text = el => (el.textContent || '').trim();
+    const has = (s, needle) => (s || '').toLowerCase().includes(needle.toLowerCase());
+    const buttonName = el => (el.getAttribute('aria-label') || text(el) || el.value || el.alt || '').trim();
+    const BUTTONS = 'button, input[type=submit], input[type=button], input[type=reset], input[type=image], [role=button]';
+    const pick = (root, sel, test) => {
+        for (const el of root.querySelectorAll(sel)) {
+            if ((!test || test(el)) && visible(el)) return el;
+        }
+        return null;
+    };
+    const strategies = [
+        // 1. Standard submit elements
+        () => [
+            () => pick(document, 'input[type="submit"]'),
+            () => pick(document, 'button[type="submit"]'),
+            () => pick(document, 'input[type="image"][alt*="submit" i]'),
+            () => pick(document, 'button[type="button"]', el => has(text(el), 'Submit')),
+            () => pick(document, 'button[type="button"]', el => has(text(el), 'Send')),
+            () => pick(document, 'input[value*="Submit" i]'),
+            () => pick(document, 'input[value*="Send" i]'),
+        ],
+        // 2. Role-based with common submit labels
+        () => labels.map(label => () => pick(document, BUTTONS, el => has(buttonName(el), label))),
+        // 3. Buttons/links inside the first form
+        () => {
+            const form = document.querySelector('form');
+            if (!form) return [];
+            return [
+                ...formLabels.map(label => () => pick(form, BUTTONS, el => has(buttonName(el), label))),
+                ...['Submit', 'Send'].map(label => () => pick(form, 'a', el => has(text(el), label))),
+            ];
+        },
+        // 4. Any of the first five form buttons with submit-like text
+        () => [() => {
+            const buttons = Array.from(document.querySelectorAll("form button, form input[type='submit']")).slice(0, 5);
+            return buttons.find(el => visible(el)
+                && /submit|send|contact|apply|register/i.test(text(el) || el.getAttribute('value') || '')) || null;
+        }],
+    ];
+    document.querySelectorAll('[data-ff-submit]').forEach(el => el.removeAttribute('data-ff-submit'));
+    for (let s = 0; s < strategies.length; s++) {
+        const finders = strategies[s]();
+        for (let rank = 0; rank < finders.length; rank++) {
+            const el = finders[rank]();
+            if (el) {
+                el.setAttribute('data-ff-submit', '1');
+                return [s + 1, rank];
+            }
+        }
+    }
+    return null;
+}
+"""
+
+_URL_THANK_RE = re.compile(r"/(thank[-_]?you|thanks|submitted|confirmation)(/|$)")
+_URL_SUCCESS_RE = re.compile(r"/success(/|$)")
+
+
+# Polled in-page by check_success: confirmation text in the body or a confirmation URL.
+_SUCCESS_JS = """
+({text, thank, success}) => {
+    const textRe = new RegExp(text, 'i');
+    const url = location.href;
+    const lowered = url.toLowerCase();
+    if (new RegExp(thank).test(lowered)) return true;
+    if (new RegExp(success).test(lowered) && !lowered.includes('success-stor')) return true;
+    if (url.includes('/post') && !url.includes('forms')) return true;
+    return !!document.body && textRe.test(document.body.innerText || '');
+}
+"""
+_SUCCESS_JS_ARG = {
+    "text": "|".join(f"(?:{p.pattern})" for p in _SUCCESS_PATTERNS),
+    "thank": _URL_THANK_RE.pattern,
+    "success": _URL_SUCCESS_RE.pattern,
+}
+
+
+def _url_looks_submitted(current_url):
+    """True if the URL looks like a post-submit confirmation page."""
+    lowered_url = current_url.lower()
+    if _URL_THANK_RE.search(lowered_url):
+        return True
+    if _URL_SUCCESS_RE.search(lowered_url) and "success-stor" not in lowered_url:
+        return True
+    if '/post' in current_url and 'forms' not in current_url:  # httpbin form submit
+        return True
+    return False
+
+
 class SubmitHandler:
     def __init__(self, page):
         self.page = page
@@ -12,6 +143,45 @@ class SubmitHandler:
         """
         Find and click submit button using multiple strategies
         """
+        try:
+            if self._click_discovered_submit():
+                return True
+        except Exception:
+            pass
+        return self._find_and_click_submit_locators()
+
+    def _click_discovered_submit(self):
+        """
+        Run submit discovery as one evaluate per frame and click the best hit.
+        Strategy 2 is label-major across frames; the others are frame-major, as in
+        the locator-based search.
+        """
+        best = None
+        for frame_idx, frame in enumerate(self.page.frames):
+            # A strategy-1 hit in an earlier frame cannot be beaten by later frames.
+            if best is not None and best[0][0] == 1:
+                break
+            try:
+                if frame.is_detached():
+                    continue
+                hit = frame.evaluate(
+                    _FIND_SUBMIT_JS, {"labels": _SUBMIT_LABELS, "formLabels": _FORM_BUTTON_LABELS}
+                )
+            except Exception:
+                continue
+            if not hit:
+                continue
+            strategy, rank = hit
+            key = (strategy, rank, frame_idx) if strategy == 2 else (strategy, frame_idx, rank)
+            if best is None or key < best[0]:
+                best = (key, frame)
+        if best is None:
+            return False
+        best[1].locator('[data-ff-submit="1"]').first.click(timeout=5000)
+        return True
+
+    def _find_and_click_submit_locators(self):
+        """Locator-based submit search (fallback when discovery finds nothing)."""
         contexts = [self.page] + list(self.page.frames)
 
         # 1. Standard submit elements
@@ -30,24 +200,17 @@ class SubmitHandler:
                     locator = ctx.locator(selector).first
                     if locator.is_visible(timeout=1000):
                         locator.click()
-                        time.sleep(2)
                         return True
                 except Exception:
                     continue
 
         # 2. Role-based with common submit labels (exact and partial)
-        submit_labels = [
-            "Submit", "Send", "submit", "send",
-            "Get in Touch", "Contact Us", "Send Message", "Request Quote",
-            "Apply", "Register", "Sign Up", "Subscribe", "Submit Form"
-        ]
-        for text in submit_labels:
+        for pattern in _SUBMIT_LABEL_PATTERNS:
             for ctx in contexts:
                 try:
-                    locator = ctx.get_by_role("button", name=re.compile(re.escape(text), re.I))
+                    locator = ctx.get_by_role("button", name=pattern)
                     if locator.first.is_visible(timeout=800):
                         locator.first.click()
-                        time.sleep(2)
                         return True
                 except Exception:
                     continue
@@ -56,12 +219,11 @@ class SubmitHandler:
         for ctx in contexts:
             try:
                 within_form = ctx.locator("form").first
-                for text in ["Submit", "Send", "Get in Touch", "Contact Us", "Send Message"]:
+                for pattern in _FORM_BUTTON_PATTERNS:
                     try:
-                        btn = within_form.get_by_role("button", name=re.compile(re.escape(text), re.I))
+                        btn = within_form.get_by_role("button", name=pattern)
                         if btn.first.is_visible(timeout=500):
                             btn.first.click()
-                            time.sleep(2)
                             return True
                     except Exception:
                         pass
@@ -70,7 +232,6 @@ class SubmitHandler:
                         link = within_form.locator(f'a:has-text("{text}")').first
                         if link.is_visible(timeout=500):
                             link.click()
-                            time.sleep(2)
                             return True
                     except Exception:
                         pass
@@ -87,9 +248,8 @@ class SubmitHandler:
                         el = form_buttons.nth(i)
                         if el.is_visible(timeout=500):
                             txt = (el.text_content() or el.get_attribute("value") or "").strip()
-                            if re.search(r"submit|send|contact|apply|register", txt, re.I):
+                            if _SUBMIT_TEXT_RE.search(txt):
                                 el.click()
-                                time.sleep(2)
                                 return True
                     except Exception:
                         continue
@@ -98,49 +258,30 @@ class SubmitHandler:
 
         return False
 
-    def check_success(self):
+    def check_success(self, timeout_ms=5000):
         """
-        Check if form submission was successful
+        Check if form submission was successful.
+        Polls the page (100 ms interval) for confirmation text or a confirmation URL,
+        surviving navigations, until timeout_ms.
         """
-        # Use specific confirmation phrases (avoid overly generic words like "success").
-        success_patterns = [
-            re.compile(r"thank(s)?\s+you", re.I),
-            re.compile(r"thanks?\s+for\s+(contacting|reaching out)", re.I),
-            re.compile(r"message\s+(has\s+been\s+)?(sent|submitted)", re.I),
-            re.compile(r"(form|request|application)\s+(has\s+been\s+)?submitted", re.I),
-            re.compile(r"(submission|request)\s+(has\s+been\s+)?received", re.I),
-            re.compile(r"we('ll| will)\s+(be in touch|contact you|reach out)", re.I),
-        ]
+        # page.url is tracked client-side: a confirmation redirect costs no round-trip.
+        if _url_looks_submitted(self.page.url):
+            return True
 
-        for pattern in success_patterns:
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                break
             try:
-                if self.page.get_by_text(pattern).first.is_visible(timeout=2000):
-                    return True
+                self.page.wait_for_function(
+                    _SUCCESS_JS, arg=_SUCCESS_JS_ARG, timeout=remaining_ms, polling=100
+                )
+                return True
             except Exception:
-                continue
-
-        # Check if redirected (e.g. httpbin /forms/post -> /post)
-        current_url = self.page.url
-        lowered_url = current_url.lower()
-        if re.search(r"/(thank[-_]?you|thanks|submitted|confirmation)(/|$)", lowered_url):
-            return True
-        if re.search(r"/success(/|$)", lowered_url) and "success-stor" not in lowered_url:
-            return True
-        if '/post' in current_url and 'forms' not in current_url:  # httpbin form submit
-            return True
-
-        # Retry: wait for navigation that may be in progress
-        try:
-            self.page.wait_for_load_state("networkidle", timeout=5000)
-        except Exception:
-            pass
-        current_url = self.page.url
-        lowered_url = current_url.lower()
-        if re.search(r"/(thank[-_]?you|thanks|submitted|confirmation)(/|$)", lowered_url):
-            return True
-        if re.search(r"/success(/|$)", lowered_url) and "success-stor" not in lowered_url:
-            return True
-        if '/post' in current_url and 'forms' not in current_url:
-            return True
-
-        return False
+                # Timed out, or the context was torn down by a navigation; the URL
+                # check covers redirects (e.g. httpbin /forms/post -> /post).
+                if _url_looks_submitted(self.page.url):
+                    return True
+                time.sleep(0.1)
+        return _url_looks_submitted(self.page.url)
@@ -3,6 +3,42 @@ Form fill verification
 """
 import re
 
+_WS_RE = re.compile(r"\s+")
+_NONDIGIT_RE = re.compile(r"\D")
+# str.translate table deleting every ASCII non-digit (used for pure-ASCII input).
+_DROP_ASCII_NONDIGITS = {c: None for c in range(128) if not 48 <= c <= 57}
+# Per-read wait in verify_fill (the element is known to exist by then).
+_READ_TIMEOUT_MS = 2000
+
+# Reads the current value of many fields in one call. Each spec is
+# {selector, xpath, type}; yields the value string, or null when the element
+# cannot be found (the caller then verifies that field the slow way).
+_READ_VALUES_JS = """
+specs => specs.map(({selector, xpath, type}) => {
+    let el = null;
+    if (selector) {
+        try { el = document.querySelector(selector); } catch (e) { el = null; }
+    }
+    if (!el && xpath) {
+        try {
+            el = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        } catch (e) { el = null; }
+    }
+    if (!el) return null;
+    const tag = el.tagName;
+    let value = null;
+    if (type === 'select' && el.options) {
+        value = el.selectedIndex >= 0 ? (el.options[el.selectedIndex].text || el.value || '') : (el.value || '');
+    } else if (tag === 'INPUT' || tag === 'TEXTAREA' || tag === 'SELECT') {
+        value = el.value;
+    }
+    if (!value || (type === 'textarea' && !value.trim())) {
+        value = el.innerText || el.textContent || '';
+    }
+    return value;
+})
+"""
+
 class VerificationEngine:
     def __init__(self, page, screenshot_path):
         self.page = page
@@ -27,20 +63,21 @@ class VerificationEngine:
             if dom_type == "select":
                 try:
                     actual_value = locator.evaluate(
-                        "el => (el.options && el.selectedIndex >= 0) ? (el.options[el.selectedIndex].text || el.value || '') : (el.value || '')"
+                        "el => (el.options && el.selectedIndex >= 0) ? (el.options[el.selectedIndex].text || el.value || '') : (el.value || '')",
+                        timeout=_READ_TIMEOUT_MS,
                     )
                 except Exception:
                     actual_value = None
             try:
                 if actual_value is None:
-                    actual_value = locator.input_value()
+                    actual_value = locator.input_value(timeout=_READ_TIMEOUT_MS)
             except Exception:
                 pass
 
             # contenteditable / textarea with innerText
             if not actual_value or (dom_type == 'textarea' and not actual_value.strip()):
                 try:
-                    actual_value = locator.evaluate("el => el.innerText || el.textContent || ''")
+                    actual_value = locator.evaluate("el => el.innerText || el.textContent || ''", timeout=_READ_TIMEOUT_MS)
                 except Exception:
                     pass
 
@@ -50,35 +87,87 @@ class VerificationEngine:
             print(f"Failed to verify field: {e}")
             return False
 
+    def verify_fills_batch(self, elements_and_values):
+        """
+        Verify many (element_info, expected_value) pairs, reading all values of a
+        frame in a single evaluate. Returns a list of bools in input order.
+        """
+        results = [None] * len(elements_and_values)
+        by_frame = {}
+        for i, (element_info, _) in enumerate(elements_and_values):
+            dom_info = element_info.get("dom", {})
+            context = self._resolve_context(
+                (dom_info.get("frame_url") or "").strip(),
+                (dom_info.get("frame_name") or "").strip(),
+            )
+            by_frame.setdefault(id(context), (context, []))[1].append(i)
+
+        for context, indices in by_frame.values():
+            specs = []
+            for i in indices:
+                dom_info = elements_and_values[i][0].get("dom", {})
+                specs.append({
+                    "selector": (dom_info.get("selector") or "").strip(),
+                    "xpath": (dom_info.get("xpath") or "").strip(),
+                    "type": str(dom_info.get("type", "")).lower(),
+                })
+            try:
+                actual_values = context.evaluate(_READ_VALUES_JS, specs)
+            except Exception:
+                continue
+            for i, actual_value in zip(indices, actual_values):
+                if actual_value is not None:
+                    results[i] = self._is_match(actual_value, elements_and_values[i][1])
+
+        # Anything the batch could not read goes through the per-field path.
+        for i, (element_info, expected_value) in enumerate(elements_and_values):
+            if results[i] is None:
+                results[i] = self.verify_fill(element_info, expected_value)
+        return results
+
+    def _resolve_context(self, frame_url, frame_name):
+        if frame_url or frame_name:
+            for fr in self.page.frames:
+                if frame_url and fr.url == frame_url:
+                    return fr
+                if frame_name and fr.name == frame_name:
+                    return fr
+        return self.page
+
     def _resolve_locator(self, element_info):
         dom_info = element_info.get("dom", {})
         selector = (dom_info.get("selector") or "").strip()
         xpath = (dom_info.get("xpath") or "").strip()
         frame_url = (dom_info.get("frame_url") or "").strip()
         frame_name = (dom_info.get("frame_name") or "").strip()
+        return self._find_locator(selector, xpath, frame_url, frame_name)
 
-        context = self.page
-        if frame_url or frame_name:
-            for fr in self.page.frames:
-                if frame_url and fr.url == frame_url:
-                    context = fr
-                    break
-                if frame_name and fr.name == frame_name:
-                    context = fr
-                    break
-
-        if selector:
-            try:
-                loc = context.locator(selector).first
-                if loc.count() > 0:
-                    return loc
-            except Exception:
-                pass
-        if xpath:
+    def _find_locator(self, selector, xpath, frame_url, frame_name):
+        # One count() round-trip covers both selector and xpath (via or_()), so a
+        # missing element is rejected up front instead of waiting out the timed reads.
+        context = self._resolve_context(frame_url, frame_name)
+        candidates = []
+        try:
+            if selector:
+                candidates.append(context.locator(selector))
+            if xpath:
+                candidates.append(context.locator(f"xpath={xpath}"))
+        except Exception:
+            pass
+        if not candidates:
+            return None
+        try:
+            loc = candidates[0].or_(candidates[1]) if len(candidates) == 2 else candidates[0]
+            if loc.count() > 0:
+                return loc.first
+            return None
+        except Exception:
+            pass
+        # e.g. an invalid CSS selector fails the combined query; probe each on its own.
+        for loc in candidates:
             try:
-                loc = context.locator(f"xpath={xpath}").first
                 if loc.count() > 0:
-                    return loc
+                    return loc.first
             except Exception:
                 pass
         return None
@@ -87,15 +176,19 @@ class VerificationEngine:
     def _normalize_text(value):
         if value is None:
             return ""
-        value = str(value).strip().lower()
-        value = re.sub(r"\s+", " ", value)
-        return value
+        return _WS_RE.sub(" ", str(value).strip().lower())
 
     @staticmethod
     def _digits_only(value):
-        return re.sub(r"\D", "", value or "")
+        value = value or ""
+        if value.isascii():
+            return value.translate(_DROP_ASCII_NONDIGITS)
+        return _NONDIGIT_RE.sub("", value)
 
     def _is_match(self, actual_value, expected_value):
+        if expected_value and actual_value == expected_value:
+            return True  # Raw exact match (the common case) needs no normalization
+
         actual = self._normalize_text(actual_value)
         expected = self._normalize_text(expected_value)
 
@@ -108,7 +201,9 @@ class VerificationEngine:
             return True
 
         # Accept common UI transformations: extra spaces, masks, prefixes
-        if expected in actual or actual in expected:
+        # Only the shorter string can be contained in the longer one: one scan.
+        shorter, longer = (expected, actual) if len(expected) <= len(actual) else (actual, expected)
+        if shorter in longer:
             return True
 
         # Handle maxlength truncation: expected may be longer than actual
@@ -117,10 +212,13 @@ class VerificationEngine:
         if len(expected) >= 5 and actual[:len(expected)] == expected:
             return True
 
-        # Handle phone formatting differences like +1 (234) 567-8900
-        actual_digits = self._digits_only(actual)
+        # Handle phone formatting differences like +1 (234) 567-8900. Both checks
+        # need at least 7 expected digits (actual digits must fit inside them).
         expected_digits = self._digits_only(expected)
-        if len(expected_digits) >= 7 and expected_digits in actual_digits:
+        if len(expected_digits) < 7:
+            return False
+        actual_digits = self._digits_only(actual)
+        if expected_digits in actual_digits:
             return True
         if len(actual_digits) >= 7 and actual_digits in expected_digits:
             return True
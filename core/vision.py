@@ -4,53 +4,65 @@ UI element detection using computer vision
 import cv2
 import numpy as np
 
+from core.dom_mapper import DOMMapper
+
+# Wider screenshots are downscaled to this width before edge detection.
+MAX_DETECT_WIDTH = 1280
+
 
 class UIElementDetector:
     def __init__(self, min_w=40, min_h=18):
         self.min_w = int(min_w)
         self.min_h = int(min_h)
+        # Joins broken rectangle borders and masked input outlines.
+        self._close_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 3))
 
-    def detect_form_elements(self, image_path):
+    def detect_form_elements(self, image_path, image=None):
         """
         Detect form elements in screenshot
+        image: optional already-decoded BGR array of the same screenshot (skips the file read)
         Returns: List of (x, y, w, h, element_type)
         """
-        image = cv2.imread(image_path)
+        if image is None:
+            # Decode in color: IMREAD_GRAYSCALE rounds differently from cvtColor and shifts edges.
+            image = cv2.imread(image_path)
         if image is None:
             return []
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+        # Edge/morphology passes are pixel-bound; run them on a capped-width copy.
+        scale = min(1.0, MAX_DETECT_WIDTH / float(max(1, gray.shape[1])))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        inv = 1.0 / scale
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         blur = cv2.GaussianBlur(gray, (5, 5), 0)
         edges = cv2.Canny(blur, 40, 130)
 
-        # Join broken rectangle borders and masked input outlines.
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 3))
-        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, iterations=2)
+        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, self._close_kernel, iterations=2)
 
         contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        boxes = []
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt)
-            if w < self.min_w or h < self.min_h:
-                continue
-            area = w * h
-            if area < 900:
-                continue
-
-            aspect = w / float(max(1, h))
-            element_type = "input"
-            if h >= 70:
-                element_type = "textarea"
-            elif aspect < 1.8 and h >= 28:
-                element_type = "button"
-
-            boxes.append((x, y, w, h, element_type))
+        if not contours:
+            return []
+        rects = np.array([cv2.boundingRect(cnt) for cnt in contours], dtype=np.int64)
+        if scale < 1.0:
+            rects = np.rint(rects * inv).astype(np.int64)
+
+        w, h = rects[:, 2], rects[:, 3]
+        rects = rects[(w >= self.min_w) & (h >= self.min_h) & (w * h >= 900)]
+        w, h = rects[:, 2], rects[:, 3]
+        types = np.where(
+            h >= 70,
+            "textarea",
+            np.where((w / np.maximum(1, h) < 1.8) & (h >= 28), "button", "input"),
+        )
+        boxes = [(x, y, bw, bh, t) for (x, y, bw, bh), t in zip(rects.tolist(), types.tolist())]
 
         return self._dedupe_boxes(boxes, iou_threshold=0.45)
 
-    def draw_detection_overlay(self, screenshot_path, elements, output_path):
-        """Draw detected elements for visual debugging."""
-        img = cv2.imread(screenshot_path)
+    def draw_detection_overlay(self, screenshot_path, elements, output_path, image=None):
+        """Draw detected elements for visual debugging (on a copy of `image` when given)."""
+        img = image.copy() if image is not None else cv2.imread(screenshot_path)
         if img is None:
             return False
 
@@ -85,29 +97,9 @@ class UIElementDetector:
 
     @staticmethod
     def _dedupe_boxes(boxes, iou_threshold=0.45):
+        """Largest-first NMS, shared with DOMMapper (numba, or the NumPy fallback)."""
         if not boxes:
             return []
-        n = len(boxes)
-        rects = np.array([[b[0], b[1], b[0] + b[2], b[1] + b[3]] for b in boxes], dtype=float)
-        areas = (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
-        idxs = np.argsort(areas)[::-1]
-        keep = []
-
-        while len(idxs) > 0:
-            i = int(idxs[0])
-            keep.append(i)
-            if len(idxs) == 1:
-                break
-
-            others = idxs[1:]
-            xx1 = np.maximum(rects[i, 0], rects[others, 0])
-            yy1 = np.maximum(rects[i, 1], rects[others, 1])
-            xx2 = np.minimum(rects[i, 2], rects[others, 2])
-            yy2 = np.minimum(rects[i, 3], rects[others, 3])
-            inter_w = np.maximum(0, xx2 - xx1)
-            inter_h = np.maximum(0, yy2 - yy1)
-            inter = inter_w * inter_h
-            iou = inter / (areas[i] + areas[others] - inter + 1e-6)
-            idxs = others[iou < iou_threshold]
-
+        rects = np.array([b[:4] for b in boxes], dtype=np.float32)
+        keep = DOMMapper._deduplicate_detections(rects, boxes, iou_threshold=iou_threshold)
         return [boxes[i] for i in keep]
@@ -6,6 +6,9 @@ echo "==============================="
 # Install dependencies
 echo "1. Installing Python dependencies..."
 pip install -r requirements.txt
+# Optional native accelerators; everything falls back without them
+pip install -r requirements-accel.txt \
+    || echo "Skipping optional accelerators (see requirements-accel.txt)"
 
 # Install Playwright
 echo "2. Installing Playwright browsers..."
@@ -29,6 +32,10 @@ mkdir -p screenshots
 mkdir -p logs
 mkdir -p models
 
+# Optional: INT8 MiniLM for faster CPU semantic classification
+python -c "from core.semantic_classifier import build_onnx_int8; build_onnx_int8()" \
+    || echo "Skipping INT8 MiniLM export (install optimum[onnxruntime] to enable)"
+
 # Create prefill data if missing
 echo "5. Checking prefill data..."
 if [ ! -f "prefill_data.json" ]; then
@@ -3,23 +3,39 @@ Complete orchestration with all fixes applied
 """
 import csv
 import json
+import multiprocessing
 import os
 import re
 import time
-from collections import Counter
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import cv2
+import numpy as np
 import yaml
 from core.browser import BrowserManager
 from core.vision import UIElementDetector
-from core.ocr import TextExtractor
+from core.ocr import TextExtractor, decode_image_bytes
 from core.dom_mapper import DOMMapper
-from core.field_classifier import FieldClassifier
+from core.field_classifier import FieldClassifier, flush_unknown_patterns
+from core.semantic_classifier import warm_up as warm_up_semantic
 from core.filler import FormFiller
 from core.verifier import VerificationEngine
 from core.submitter import SubmitHandler
 import logging
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; plain substring scans are used instead
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; falls back to the stdlib json encoder
+    orjson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,16 +47,321 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_PREFILL_KEY_RE = re.compile(r"[^a-z0-9]+")
+_SCHEME_RE = re.compile(r"^https?://", re.IGNORECASE)
+_UNSAFE_RUN_RE = re.compile(r"[^a-zA-Z0-9]+")
+_COUNTRY_HINTS = ("country", "nation")
+_REFERRAL_HINTS = ("hear", "source", "referral", "how did you hear")
+_NAME_HINT_ATTRS = ("name", "id", "placeholder", "aria-label")
+_DROPDOWN_HINT_ATTRS = _NAME_HINT_ATTRS + ("label_text", "nearby_text")
+
+
+def _build_hint_automaton():
+    """One automaton over all dropdown hint tokens, each tagged with its category."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for category, tokens in (("country", _COUNTRY_HINTS), ("referral", _REFERRAL_HINTS)):
+        for tok in tokens:
+            automaton.add_word(tok, category)
+    automaton.make_automaton()
+    return automaton
+
+
+def _dropdown_hint_categories(attr_blob):
+    """Set of hint categories ("country", "referral") whose tokens occur in attr_blob."""
+    if _HINT_AUTOMATON is not None:
+        return {category for _, category in _HINT_AUTOMATON.iter(attr_blob)}
+    categories = set()
+    if any(tok in attr_blob for tok in _COUNTRY_HINTS):
+        categories.add("country")
+    if any(tok in attr_blob for tok in _REFERRAL_HINTS):
+        categories.add("referral")
+    return categories
+
+
+_HINT_AUTOMATON = _build_hint_automaton()
+
+
+def _attr_blob(attributes, keys):
+    """
+    Lowercased values of `keys` (matched case-insensitively, last wins) joined by
+    spaces; only the requested values are lowercased, not the whole dict.
+    """
+    by_key = {str(k).lower(): v for k, v in (attributes or {}).items() if v}
+    return " ".join(str(by_key[k]).lower() if k in by_key else "" for k in keys)
+
+
+_CAPTCHA_SELECTORS = [
+    'iframe[src*="recaptcha"]',
+    'div[class*="captcha"]',
+    'div[class*="g-recaptcha"]',
+    'img[src*="captcha"]'
+]
+# Visible in Playwright's sense: first match has a non-empty box and is not visibility:hidden.
+_CAPTCHA_VISIBLE_JS = """sels => sels.some(sel => {
+    const el = document.querySelector(sel);
+    if (!el) return false;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+})"""
+_COUNT_FIELDS_JS = """() => document.querySelectorAll("input, textarea, select, [contenteditable='true']").length"""
+_FORM_FIELD_READY_SELECTOR = "form input, form textarea, form select, textarea"
+# Field count across the top document and every same-origin descendant frame, in one
+# round-trip; complete=false when some frame was cross-origin (not readable from here).
+_COUNT_FIELDS_ALL_FRAMES_JS = """() => {
+    const sel = "input, textarea, select, [contenteditable='true']";
+    let count = 0;
+    let complete = true;
+    const visit = (win) => {
+        let doc;
+        try { doc = win.document; count += doc.querySelectorAll(sel).length; }
+        catch (e) { complete = false; return; }
+        for (let i = 0; i < win.frames.length; i++) visit(win.frames[i]);
+    };
+    visit(window);
+    return {count, complete};
+}"""
+_FIELD_COUNT_ABOVE_JS = f"n => ({_COUNT_FIELDS_ALL_FRAMES_JS})().count > n"
+# Largest form of at least 120x80 CSS px (first wins ties), with the scroll/DPR needed for origin_px.
+_PRIMARY_FORM_JS = """() => {
+    document.querySelectorAll('[data-ff-primary-form]').forEach(el => el.removeAttribute('data-ff-primary-form'));
+    let best = null;
+    let bestForm = null;
+    document.querySelectorAll("form").forEach((form) => {
+        const r = form.getBoundingClientRect();
+        if (r.width < 120 || r.height < 80) return;
+        const area = r.width * r.height;
+        if (!best || area > best.area) {
+            best = {area, x: r.x, y: r.y, width: r.width, height: r.height};
+            bestForm = form;
+        }
+    });
+    if (best) {
+        // Tag the winner so Python fetches this exact node; a positional `form >> nth=`
+        // would also count forms inside shadow roots and can pick a different one.
+        bestForm.setAttribute('data-ff-primary-form', '1');
+        best.scrollX = window.scrollX;
+        best.scrollY = window.scrollY;
+        best.devicePixelRatio = window.devicePixelRatio;
+    }
+    return best;
+}"""
+
+# (label, compiled pattern, weight) signals scored on post-submit OCR text.
+_OCR_SUCCESS_PATTERNS = [
+    ("thank_you", re.compile(r"\bthank(s)?\s+you\b", re.IGNORECASE), 3),
+    ("thanks_for_contacting", re.compile(r"\bthanks?\s+for\s+(contacting|reaching out)\b", re.IGNORECASE), 3),
+    ("message_sent", re.compile(r"\bmessage\s+(has\s+been\s+)?(sent|submitted)\b", re.IGNORECASE), 3),
+    ("form_submitted", re.compile(r"\bform\s+(has\s+been\s+)?submitted\b", re.IGNORECASE), 3),
+    ("submission_received", re.compile(r"\b(submission|request)\s+(has\s+been\s+)?received\b", re.IGNORECASE), 3),
+    ("we_will_contact", re.compile(r"\bwe('ll| will)\s+(be in touch|contact you|reach out)\b", re.IGNORECASE), 3),
+    ("api_json", re.compile(r"application/json", re.IGNORECASE), 2),  # API/test form responses (e.g. httpbin)
+    ("api_form_payload", re.compile(r'"form"\s*:', re.IGNORECASE), 2),  # JSON form response
+    ("submitted_word", re.compile(r"\bsubmitted\b", re.IGNORECASE), 1),
+]
+_OCR_FAILURE_PATTERNS = [
+    ("field_error", re.compile(r"\bone or more fields have an error\b", re.IGNORECASE), 4),
+    ("required_fields", re.compile(r"\brequired fields?\b", re.IGNORECASE), 2),
+    ("field_required", re.compile(r"\bthis field is required\b", re.IGNORECASE), 3),
+    ("invalid_input", re.compile(r"\binvalid\b", re.IGNORECASE), 2),
+    ("enter_valid_value", re.compile(r"\bplease\s+enter\s+(an?\s+)?valid\b", re.IGNORECASE), 2),
+    ("please_choose", re.compile(r"\bplease\s+choose\b", re.IGNORECASE), 1),
+    ("please_select", re.compile(r"\bplease\s+select\b", re.IGNORECASE), 1),
+    ("check_try_again", re.compile(r"\bplease check and try again\b", re.IGNORECASE), 3),
+    ("captcha", re.compile(r"\b(?:re)?captcha\b", re.IGNORECASE), 4),
+    ("verification_failed", re.compile(r"\bverification failed\b", re.IGNORECASE), 3),
+    ("something_wrong", re.compile(r"\bsomething went wrong\b", re.IGNORECASE), 3),
+]
+_OCR_SIGNAL_PATTERNS = _OCR_SUCCESS_PATTERNS + _OCR_FAILURE_PATTERNS
+_OCR_SIGNAL_LABELS = tuple(label for label, _, _ in _OCR_SIGNAL_PATTERNS)
+_OCR_SIGNAL_WEIGHTS = tuple(weight for _, _, weight in _OCR_SIGNAL_PATTERNS)
+# Union of every signal pattern: one scan tells whether any of them can hit at all.
+_OCR_SIGNAL_ANY_RE = re.compile(
+    "|".join(f"(?:{pattern.pattern})" for _, pattern, _ in _OCR_SIGNAL_PATTERNS), re.IGNORECASE
+)
+
+
+def _ocr_signal_hits(text_blob):
+    """Ascending indices of the _OCR_SIGNAL_PATTERNS found in text_blob."""
+    # Most pages match nothing: one union scan rules them out before the per-pattern searches.
+    if not _OCR_SIGNAL_ANY_RE.search(text_blob):
+        return []
+    return [i for i, (_, pattern, _) in enumerate(_OCR_SIGNAL_PATTERNS) if pattern.search(text_blob)]
+
+
+_OcrVerdict = namedtuple(
+    "_OcrVerdict",
+    "success failure success_matches failure_matches success_score failure_score",
+)
+
+
+@lru_cache(maxsize=1024)
+def _classify_ocr_blob(text_blob):
+    """Weighted success/failure verdict for an OCR text blob (memoized; the patterns are static)."""
+    hits = _ocr_signal_hits(text_blob)
+    # Hits are ascending, so success ids (the first block of patterns) are a prefix.
+    split = bisect_left(hits, len(_OCR_SUCCESS_PATTERNS))
+    success_ids, failure_ids = hits[:split], hits[split:]
+    success_matches = [_OCR_SIGNAL_LABELS[i] for i in success_ids]
+    success_score = sum(_OCR_SIGNAL_WEIGHTS[i] for i in success_ids)
+    failure_matches = [_OCR_SIGNAL_LABELS[i] for i in failure_ids]
+    failure_score = sum(_OCR_SIGNAL_WEIGHTS[i] for i in failure_ids)
+
+    success = False
+    failure = False
+    if success_score >= 3 and failure_score >= 3:
+        if failure_score >= success_score:
+            failure = True
+        else:
+            success = True
+    elif success_score >= 3:
+        success = True
+    elif failure_score >= 3:
+        failure = True
+    return _OcrVerdict(
+        success, failure, tuple(success_matches), tuple(failure_matches), success_score, failure_score
+    )
+
+
+_STATUS_COLORS = {
+    "filled": (60, 180, 75),  # green
+    "fill_failed": (0, 0, 255),  # red
+    "ready_to_fill": (255, 200, 0),  # amber
+}
+_DEFAULT_STATUS_COLOR = (180, 180, 180)  # gray
+
+
+def _draw_box_outlines(image, boxes, colors, thickness=2):
+    """Draw every (x, y, w, h) outline into image with one fancy-indexed write per edge kind."""
+    img_h, img_w = image.shape[:2]
+    left, top = boxes[:, 0], boxes[:, 1]
+    right, bottom = left + boxes[:, 2], top + boxes[:, 3]
+
+    def _spans(start, stop, limit):
+        # Concatenated in-image aranges start[i]..stop[i], plus the owning box of each entry.
+        start = np.clip(start, 0, limit)
+        lengths = np.maximum(np.clip(stop + 1, 0, limit) - start, 0)
+        owner = np.repeat(np.arange(len(start)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return start[owner] + offsets, owner
+
+    # Edges that fall outside the image are skipped, as cv2.rectangle clips them.
+    cols, owner = _spans(left, right, img_w)
+    for k in range(thickness):
+        for row in (top + k, bottom - k):
+            row = row[owner]
+            inside = (row >= 0) & (row < img_h)
+            image[row[inside], cols[inside]] = colors[owner[inside]]
+    rows, owner = _spans(top, bottom, img_h)
+    for k in range(thickness):
+        for col in (left + k, right - k):
+            col = col[owner]
+            inside = (col >= 0) & (col < img_w)
+            image[rows[inside], col[inside]] = colors[owner[inside]]
+    return image
+
+
+class _ResultsCsv:
+    """
+    Results CSV keyed by URL. Rows for new URLs are appended through one buffered
+    handle; the file is only rewritten when an existing URL's row changes.
+    """
+    FIELDNAMES = ["URL", "Submission", "Reason"]
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}  # URL -> row, in file order
+        self.exported = 0  # how many AutomatedFormFiller.results are already in rows
+        self._fp = None
+        self._writer = None
+        self._rewrite = not os.path.exists(path)
+        if self._rewrite:
+            return
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                url = (row.get("URL") or "").strip()
+                if not url or url in self.rows:
+                    self._rewrite = True  # normalize blank/duplicate rows away
+                    if not url:
+                        continue
+                self.rows[url] = {
+                    "URL": url,
+                    "Submission": (
+                        row.get("Submission")
+                        or row.get("Submission status")
+                        or "unsuccessful"
+                    ),
+                    "Reason": (row.get("Reason") or row.get("reason") or "")
+                }
+            if reader.fieldnames != self.FIELDNAMES:
+                self._rewrite = True  # legacy or missing header
+
+    def upsert(self, rows):
+        appended = []
+        for row in rows:
+            previous = self.rows.get(row["URL"])
+            if previous is None:
+                appended.append(row)
+            elif previous != row:
+                self._rewrite = True
+            self.rows[row["URL"]] = row
+
+        if self._rewrite:
+            self.close()
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDNAMES)
+                writer.writeheader()
+                writer.writerows(self.rows.values())
+            self._rewrite = False
+        elif appended:
+            if self._fp is None:
+                self._fp = open(self.path, 'a', newline='', encoding='utf-8', buffering=1024 * 1024)
+                self._writer = csv.DictWriter(self._fp, fieldnames=self.FIELDNAMES)
+            self._writer.writerows(appended)
+            self._fp.flush()
+
+    def close(self):
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            except Exception:
+                pass
+        self._fp = None
+        self._writer = None
+
+
 class AutomatedFormFiller:
     def __init__(self, prefill_data_path="prefill_data.json", config_path="config.yaml"):
+        self._init_args = (prefill_data_path, config_path)
         with open(prefill_data_path) as f:
             self.prefill_data = json.load(f)
+        # Normalized-key view of prefill_data for case/punctuation-insensitive lookups.
+        self._prefill_norm = {
+            _PREFILL_KEY_RE.sub("", str(k).strip().lower()): v
+            for k, v in (self.prefill_data or {}).items()
+            if v is not None
+        }
         self.config = self._load_config(config_path)
         ocr_cfg = self.config.get("ocr", {})
         output_cfg = self.config.get("output", {})
 
+        adv_cfg = self.config.get("advanced", {})
+        self.use_minilm = bool(adv_cfg.get("use_minilm", True))
+        self.log_unknown_patterns = bool(adv_cfg.get("log_unknown_patterns", True))
+        self.skip_successful_urls = bool(adv_cfg.get("skip_successful_urls", True))
+        self.skipped_successful = 0
+
+        if self.use_minilm:
+            warm_up_semantic()  # loads MiniLM in the background while the browser starts
+
         self.browser = BrowserManager(headless=False)
         self.detector = UIElementDetector()
+        # OpenCV releases the GIL, so detection overlaps the DOM harvest round-trips.
+        self._cv_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cv-detect")
+        # Live traces are serialized and written off the page loop; shutdown() drains it.
+        self._trace_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer")
         self.ocr = TextExtractor(
             lang=ocr_cfg.get("language", "eng"),
             min_confidence=int(ocr_cfg.get("min_confidence", 50))
@@ -53,6 +374,15 @@ class AutomatedFormFiller:
             "annotated_screenshots_dir",
             os.path.join("logs", "annotated_screenshots")
         )
+        self.annotated_format = str(output_cfg.get("annotated_format", "png")).lower().lstrip(".")
+        if self.annotated_format == "webp":
+            self.annotated_write_params = [cv2.IMWRITE_WEBP_QUALITY, int(output_cfg.get("annotated_webp_quality", 90))]
+        else:
+            # Level 1 encodes several times faster than OpenCV's default 3 for a slightly larger file.
+            self.annotated_format = "png"
+            self.annotated_write_params = [
+                cv2.IMWRITE_PNG_COMPRESSION, int(output_cfg.get("annotated_png_compression", 1))
+            ]
         configured_results = output_cfg.get("results_file", "results.csv")
         if os.path.isabs(configured_results):
             self.results_output_path = configured_results
@@ -67,6 +397,7 @@ class AutomatedFormFiller:
         os.makedirs(self.live_ocr_dir, exist_ok=True)
         os.makedirs(self.annotated_screenshots_dir, exist_ok=True)
         self.results = []
+        self._results_csv = None
         self.captcha_detected = False
 
     def process_url(self, url):
@@ -116,13 +447,19 @@ class AutomatedFormFiller:
                 "ocr_failure_matches": []
             }
         }
+        # live_trace["fields"] entries by their "index", for O(1) status updates.
+        trace_by_index = {}
 
         try:
             logger.info(f"Processing: {url}")
 
             # 1. Open page
             page = self.browser.open_page(url)
-            time.sleep(2)
+            # Let script-rendered forms appear: returns at the first form field, at most 2s.
+            try:
+                page.wait_for_selector(_FORM_FIELD_READY_SELECTOR, state="attached", timeout=2000)
+            except Exception:
+                pass
 
             # 2. Check for obvious captcha early
             if self._has_captcha(page):
@@ -138,8 +475,11 @@ class AutomatedFormFiller:
             live_trace["screenshot_origin_px"] = list(shot_meta.get("origin_px", (0, 0)))
             live_trace["form_bbox"] = shot_meta.get("form_bbox")
 
-            # 4. Detect UI elements
-            boxes = self.detector.detect_form_elements(screenshot_path)
+            # Decode the captured bytes once; detection and OCR both work from memory.
+            shot_image = decode_image_bytes(shot_meta.get("png_bytes"))
+
+            # 4. Detect UI elements (in the background; DOMMapper waits for it after harvesting)
+            boxes = self._cv_pool.submit(self.detector.detect_form_elements, screenshot_path, image=shot_image)
 
             # 5. Map to DOM elements (hybrid approach)
             elements = DOMMapper.find_form_elements(
@@ -154,27 +494,31 @@ class AutomatedFormFiller:
             verifier = VerificationEngine(page, screenshot_path)
 
             fillable_elements = []
+            ocr_source = shot_image if shot_image is not None else screenshot_path
+            # Extract text with confidence (OCR) for all boxes; fallback to "" if Tesseract unavailable
+            try:
+                ocr_results = self.ocr.extract_from_page_batch(
+                    ocr_source,
+                    [element['box'] for element in elements]
+                )
+            except Exception as e:
+                logger.warning(f"OCR failed for {len(elements)} elements: {e}")
+                ocr_results = [("", 0)] * len(elements)
+
+            # Classify all fields at once (works with attributes when OCR confidence is low)
+            classifications = FieldClassifier.classify_batch(
+                [
+                    (text, element['dom']['type'], element['dom'].get('attributes', {}))
+                    for element, (text, _) in zip(elements, ocr_results)
+                ],
+                use_minilm=self.use_minilm,
+                log_unknown=self.log_unknown_patterns,
+            )
+
             for idx, element in enumerate(elements):
                 xpath = element.get('dom', {}).get('xpath', '')
-                # Extract text with confidence (OCR); fallback to "" if Tesseract unavailable
-                try:
-                    text, confidence = self.ocr.extract_with_context(
-                        screenshot_path,
-                        element['box']
-                    )
-                except Exception as e:
-                    logger.warning(f"OCR failed for element {xpath or '[no-xpath]'}: {e}")
-                    text, confidence = "", 0
-
-                # Classify field (works with attributes when OCR confidence is low)
-                adv = self.config.get("advanced", {})
-                field_type, field_confidence = FieldClassifier.classify(
-                    text,
-                    element['dom']['type'],
-                    element['dom'].get('attributes', {}),
-                    use_minilm=bool(adv.get("use_minilm", True)),
-                    log_unknown=bool(adv.get("log_unknown_patterns", True)),
-                )
+                text, confidence = ocr_results[idx]
+                field_type, field_confidence = classifications[idx]
                 live_entry = {
                     "index": idx,
                     "xpath": xpath,
@@ -190,6 +534,7 @@ class AutomatedFormFiller:
                     "reason": ""
                 }
                 live_trace["fields"].append(live_entry)
+                trace_by_index.setdefault(idx, live_entry)
                 logger.info(
                     f"[LIVE OCR] idx={idx} field={field_type} "
                     f"ocr_conf={confidence:.1f} class_conf={field_confidence} "
@@ -259,61 +604,71 @@ class AutomatedFormFiller:
 
             # 7. Fill fields with retry logic
             filled_count = 0
+            filled_pairs = []
             for element in fillable_elements:
-                field_type = element['classified_as']
                 value = element.get("resolved_value", "")
-                trace_idx = element.get("trace_index")
-                trace_ref = self._field_trace_ref(live_trace["fields"], trace_idx)
                 result["fill_attempts"] += 1
 
                 # Fill the field
                 if filler.fill_field(element, value):
-                    # Verify fill
-                    if verifier.verify_fill(element, value):
-                        filled_count += 1
-                        if trace_ref is not None:
-                            trace_ref["status"] = "filled"
-                            trace_ref["reason"] = "dom verification passed"
-                        logger.info(f"[OK] Filled {field_type}: {value[:30]}...")
-                    else:
-                        element['failed_attempts'] = element.get('failed_attempts', 0) + 1
-                        result["fill_verify_failed"] += 1
-                        if trace_ref is not None:
-                            trace_ref["status"] = "fill_failed"
-                            trace_ref["reason"] = "verification failed"
-                        logger.warning(f"[X] Failed to fill {field_type}")
+                    filled_pairs.append((element, value))
                 else:
                     element['failed_attempts'] = element.get('failed_attempts', 0) + 1
                     result["fill_action_failed"] += 1
+                    trace_ref = self._field_trace_ref(trace_by_index, element.get("trace_index"))
                     if trace_ref is not None:
                         trace_ref["status"] = "fill_failed"
                         trace_ref["reason"] = "fill action failed"
 
+            # Verify all fills at once (one DOM read per frame)
+            verified = verifier.verify_fills_batch(filled_pairs)
+            for (element, value), ok in zip(filled_pairs, verified):
+                field_type = element['classified_as']
+                trace_ref = self._field_trace_ref(trace_by_index, element.get("trace_index"))
+                if ok:
+                    filled_count += 1
+                    if trace_ref is not None:
+                        trace_ref["status"] = "filled"
+                        trace_ref["reason"] = "dom verification passed"
+                    logger.info(f"[OK] Filled {field_type}: {value[:30]}...")
+                else:
+                    element['failed_attempts'] = element.get('failed_attempts', 0) + 1
+                    result["fill_verify_failed"] += 1
+                    if trace_ref is not None:
+                        trace_ref["status"] = "fill_failed"
+                        trace_ref["reason"] = "verification failed"
+                    logger.warning(f"[X] Failed to fill {field_type}")
+
             # 7b. Detect and process dynamic fields that appear after interactions.
             dynamic_elements, dynamic_shot = self.detect_dynamic_fields(
                 page,
                 url,
-                seen_elements=elements + fillable_elements
+                seen_elements=elements  # fillable_elements is a subset of these
             )
             if dynamic_elements:
                 verifier_dynamic = VerificationEngine(page, dynamic_shot)
                 base_idx = len(live_trace["fields"])
+                try:
+                    dynamic_ocr = self.ocr.extract_from_page_batch(
+                        dynamic_shot,
+                        [element['box'] for element in dynamic_elements]
+                    )
+                except Exception:
+                    dynamic_ocr = [("", 0)] * len(dynamic_elements)
+
+                dynamic_classes = FieldClassifier.classify_batch(
+                    [
+                        (text, element['dom']['type'], element['dom'].get('attributes', {}))
+                        for element, (text, _) in zip(dynamic_elements, dynamic_ocr)
+                    ],
+                    use_minilm=self.use_minilm,
+                    log_unknown=self.log_unknown_patterns,
+                )
                 for offset, element in enumerate(dynamic_elements):
                     idx = base_idx + offset
                     xpath = element.get('dom', {}).get('xpath', '')
-                    try:
-                        text, confidence = self.ocr.extract_with_context(dynamic_shot, element['box'])
-                    except Exception:
-                        text, confidence = "", 0
-
-                    adv = self.config.get("advanced", {})
-                    field_type, field_confidence = FieldClassifier.classify(
-                        text,
-                        element['dom']['type'],
-                        element['dom'].get('attributes', {}),
-                        use_minilm=bool(adv.get("use_minilm", True)),
-                        log_unknown=bool(adv.get("log_unknown_patterns", True)),
-                    )
+                    text, confidence = dynamic_ocr[offset]
+                    field_type, field_confidence = dynamic_classes[offset]
                     entry = {
                         "index": idx,
                         "xpath": xpath,
@@ -329,6 +684,7 @@ class AutomatedFormFiller:
                         "reason": "dynamic field",
                     }
                     live_trace["fields"].append(entry)
+                    trace_by_index.setdefault(idx, entry)
                     if FieldClassifier.should_skip_field(field_type, element):
                         entry["status"] = "skipped"
                         entry["reason"] = "non-fillable dynamic field"
@@ -371,14 +727,16 @@ class AutomatedFormFiller:
                 live_trace["submit"]["attempted"] = True
                 if submitter.find_and_click_submit():
                     live_trace["submit"]["clicked"] = True
-                    time.sleep(3)  # Allow redirect/navigation to complete
-                    # Enhanced success detection
+                    # Enhanced success detection (polls through redirect/navigation)
                     dom_success = submitter.check_success()
                     live_trace["submit"]["dom_success"] = dom_success
                     post_submit_shot = self._build_screenshot_path(url, "post_submit")
-                    self._capture_form_preferred_screenshot(page, post_submit_shot)
+                    post_submit_meta = self._capture_form_preferred_screenshot(page, post_submit_shot)
                     live_trace["post_submit_screenshot"] = post_submit_shot
-                    ocr_signal = self._post_submit_ocr_signal(post_submit_shot)
+                    ocr_signal = self._post_submit_ocr_signal(
+                        post_submit_shot,
+                        image=decode_image_bytes(post_submit_meta.get("png_bytes")),
+                    )
                     ocr_success = bool(ocr_signal.get("success"))
                     ocr_failure = bool(ocr_signal.get("failure"))
                     ocr_excerpt = ocr_signal.get("excerpt", "")
@@ -430,7 +788,7 @@ class AutomatedFormFiller:
         finally:
             if page:
                 try:
-                    page.close()
+                    self.browser.release_page(page)
                 except Exception as e:
                     logger.warning(f"Failed to close page cleanly: {e}")
 
@@ -454,27 +812,12 @@ class AutomatedFormFiller:
 
     def _has_captcha(self, page):
         """Early captcha detection"""
-        captcha_selectors = [
-            'iframe[src*="recaptcha"]',
-            'div[class*="captcha"]',
-            'div[class*="g-recaptcha"]',
-            'img[src*="captcha"]'
-        ]
-
-        for selector in captcha_selectors:
-            if page.is_visible(selector, timeout=1000):
-                return True
-
-        return False
+        # All selectors checked in one round-trip (is_visible ignores its timeout anyway).
+        return bool(page.evaluate(_CAPTCHA_VISIBLE_JS, _CAPTCHA_SELECTORS))
 
     def _resolve_prefill_value(self, field_type, attributes):
         # Direct key + case-insensitive/normalized lookup.
-        prefill_norm = {}
-        for k, v in (self.prefill_data or {}).items():
-            if v is None:
-                continue
-            key = re.sub(r"[^a-z0-9]+", "", str(k).strip().lower())
-            prefill_norm[key] = v
+        prefill_norm = self._prefill_norm
 
         if field_type in self.prefill_data:
             return self.prefill_data[field_type]
@@ -503,22 +846,14 @@ class AutomatedFormFiller:
             )
         if field_type == "dropdown":
             # Generic dropdown fallback: prefer explicit keys.
-            attrs = {str(k).lower(): str(v).lower() for k, v in (attributes or {}).items() if v}
-            attr_blob = " ".join([
-                attrs.get("name", ""),
-                attrs.get("id", ""),
-                attrs.get("placeholder", ""),
-                attrs.get("aria-label", ""),
-                attrs.get("label_text", ""),
-                attrs.get("nearby_text", "")
-            ])
-            if any(tok in attr_blob for tok in ["country", "nation"]):
+            hints = _dropdown_hint_categories(_attr_blob(attributes, _DROPDOWN_HINT_ATTRS))
+            if "country" in hints:
                 return (
                     self.prefill_data.get("country")
                     or self.prefill_data.get("Country")
                     or prefill_norm.get("country")
                 )
-            if any(tok in attr_blob for tok in ["hear", "source", "referral", "how did you hear"]):
+            if "referral" in hints:
                 return (
                     self.prefill_data.get("where_did_you_hear_about_us")
                     or self.prefill_data.get("Where did you hear about us")
@@ -526,7 +861,6 @@ class AutomatedFormFiller:
                 )
             return None
 
-        attrs = {str(k).lower(): str(v).lower() for k, v in (attributes or {}).items() if v}
         full_name = (self.prefill_data.get("full_name") or "").strip()
         first_name = (self.prefill_data.get("first_name") or "").strip()
         last_name = (self.prefill_data.get("last_name") or "").strip()
@@ -553,12 +887,7 @@ class AutomatedFormFiller:
             return None
 
         # Fallback by attribute hints for mixed "name" keys.
-        attr_blob = " ".join([
-            attrs.get("name", ""),
-            attrs.get("id", ""),
-            attrs.get("placeholder", ""),
-            attrs.get("aria-label", "")
-        ])
+        attr_blob = _attr_blob(attributes, _NAME_HINT_ATTRS)
         if "first" in attr_blob and (first_name or full_name):
             return first_name or full_name.split()[0]
         if ("last" in attr_blob or "surname" in attr_blob) and (last_name or full_name):
@@ -570,26 +899,28 @@ class AutomatedFormFiller:
         """
         Detect fields that appear after interaction and return only new ones.
         """
-        seen_elements = seen_elements or []
-        seen_keys = {self._element_identity(e) for e in seen_elements}
-
         initial_count = self._count_dom_fields(page)
         if after_action:
             try:
                 after_action()
             except Exception:
                 pass
-            time.sleep(1)
-        else:
-            time.sleep(0.5)
+        # Returns as soon as the (same-origin) field count grows; otherwise waits out the timeout.
+        try:
+            page.wait_for_function(
+                _FIELD_COUNT_ABOVE_JS, arg=initial_count, timeout=1000 if after_action else 500, polling=100
+            )
+        except Exception:
+            pass
 
         current_count = self._count_dom_fields(page)
         if current_count <= initial_count:
             return [], ""
+        seen_keys = {self._element_identity(e) for e in (seen_elements or [])}
 
         screenshot_path = self._build_screenshot_path(url, "dynamic")
         shot_meta = self._capture_form_preferred_screenshot(page, screenshot_path)
-        boxes = self.detector.detect_form_elements(screenshot_path)
+        boxes = self._cv_pool.submit(self.detector.detect_form_elements, screenshot_path)
         discovered = DOMMapper.find_form_elements(
             page,
             screenshot_path,
@@ -602,11 +933,19 @@ class AutomatedFormFiller:
         return new_elements, screenshot_path
 
     def _count_dom_fields(self, page):
+        try:
+            probe = page.evaluate(_COUNT_FIELDS_ALL_FRAMES_JS)
+            if probe and probe.get("complete"):
+                return int(probe.get("count") or 0)
+        except Exception:
+            pass
+
+        # Cross-origin iframes present: ask each frame separately.
         count = 0
-        selector = "input, textarea, select, [contenteditable='true']"
         for frame in page.frames:
             try:
-                count += len(frame.query_selector_all(selector))
+                # Only the number crosses the wire; no ElementHandles are created.
+                count += int(frame.evaluate(_COUNT_FIELDS_JS) or 0)
             except Exception:
                 continue
         return count
@@ -622,9 +961,9 @@ class AutomatedFormFiller:
         )
 
     def _sanitize_site_name(self, url):
-        host = re.sub(r"^https?://", "", (url or "").strip(), flags=re.IGNORECASE)
+        host = _SCHEME_RE.sub("", (url or "").strip())
         host = host.split("/", 1)[0].split(":", 1)[0]
-        safe_host = re.sub(r"[^a-zA-Z0-9]+", "_", host).strip("_").lower()
+        safe_host = _UNSAFE_RUN_RE.sub("_", host).strip("_").lower()
         return safe_host or "site"
 
     def _build_screenshot_path(self, url, stage=""):
@@ -649,17 +988,16 @@ class AutomatedFormFiller:
             return ""
         return text[:max_len] + ("..." if len(text) > max_len else "")
 
-    def _field_trace_ref(self, fields, idx):
+    def _field_trace_ref(self, trace_by_index, idx):
+        """Live-trace entry for a field index (first entry recorded with that index)."""
         if idx is None:
             return None
-        for field in fields:
-            if field.get("index") == idx:
-                return field
-        return None
+        return trace_by_index.get(idx)
 
-    def _post_submit_ocr_signal(self, screenshot_path):
+    def _post_submit_ocr_signal(self, screenshot_path, image=None):
         try:
-            img = cv2.imread(screenshot_path)
+            # The capture's own bytes when available; the file is only read as a fallback.
+            img = image if image is not None else cv2.imread(screenshot_path)
             if img is None:
                 return {
                     "success": False,
@@ -668,59 +1006,15 @@ class AutomatedFormFiller:
                     "failure_matches": [],
                     "excerpt": ""
                 }
-            h, w = img.shape[:2]
-            text, conf = self.ocr.extract_with_context(screenshot_path, (0, 0, w, h), context_margin=0)
+            text, conf = self.ocr.extract_with_context(img, None)
             text_blob = text or ""
-            success_patterns = [
-                ("thank_you", r"\bthank(s)?\s+you\b", 3),
-                ("thanks_for_contacting", r"\bthanks?\s+for\s+(contacting|reaching out)\b", 3),
-                ("message_sent", r"\bmessage\s+(has\s+been\s+)?(sent|submitted)\b", 3),
-                ("form_submitted", r"\bform\s+(has\s+been\s+)?submitted\b", 3),
-                ("submission_received", r"\b(submission|request)\s+(has\s+been\s+)?received\b", 3),
-                ("we_will_contact", r"\bwe('ll| will)\s+(be in touch|contact you|reach out)\b", 3),
-                ("api_json", r"application/json", 2),  # API/test form responses (e.g. httpbin)
-                ("api_form_payload", r'"form"\s*:', 2),  # JSON form response
-                ("submitted_word", r"\bsubmitted\b", 1),
-            ]
-            failure_patterns = [
-                ("field_error", r"\bone or more fields have an error\b", 4),
-                ("required_fields", r"\brequired fields?\b", 2),
-                ("field_required", r"\bthis field is required\b", 3),
-                ("invalid_input", r"\binvalid\b", 2),
-                ("enter_valid_value", r"\bplease\s+enter\s+(an?\s+)?valid\b", 2),
-                ("please_choose", r"\bplease\s+choose\b", 1),
-                ("please_select", r"\bplease\s+select\b", 1),
-                ("check_try_again", r"\bplease check and try again\b", 3),
-                ("captcha", r"\b(?:re)?captcha\b", 4),
-                ("verification_failed", r"\bverification failed\b", 3),
-                ("something_wrong", r"\bsomething went wrong\b", 3),
-            ]
-
-            success_matches = []
-            success_score = 0
-            for label, pattern, weight in success_patterns:
-                if re.search(pattern, text_blob, re.IGNORECASE):
-                    success_matches.append(label)
-                    success_score += weight
-
-            failure_matches = []
-            failure_score = 0
-            for label, pattern, weight in failure_patterns:
-                if re.search(pattern, text_blob, re.IGNORECASE):
-                    failure_matches.append(label)
-                    failure_score += weight
-
-            success = False
-            failure = False
-            if success_score >= 3 and failure_score >= 3:
-                if failure_score >= success_score:
-                    failure = True
-                else:
-                    success = True
-            elif success_score >= 3:
-                success = True
-            elif failure_score >= 3:
-                failure = True
+            verdict = _classify_ocr_blob(text_blob)
+            success_matches = list(verdict.success_matches)
+            failure_matches = list(verdict.failure_matches)
+            success_score = verdict.success_score
+            failure_score = verdict.failure_score
+            success = verdict.success
+            failure = verdict.failure
 
             excerpt = (
                 f"conf={conf:.1f} "
@@ -749,11 +1043,31 @@ class AutomatedFormFiller:
         if not self.live_ocr_enabled:
             return
         ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        safe_host = re.sub(r"[^a-zA-Z0-9]+", "_", trace.get("url", ""))[:80].strip("_") or "url"
+        safe_host = _UNSAFE_RUN_RE.sub("_", trace.get("url", ""))[:80].strip("_") or "url"
         out_path = os.path.join(self.live_ocr_dir, f"{ts}_{safe_host}.json")
         try:
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(trace, f, ensure_ascii=False, indent=2)
+            self._trace_pool.submit(self._dump_live_trace, out_path, trace)
+        except RuntimeError:
+            self._dump_live_trace(out_path, trace)  # pool already shut down
+
+    @staticmethod
+    def _dump_live_trace(out_path, trace):
+        try:
+            payload = None
+            if orjson is not None:
+                try:
+                    payload = orjson.dumps(
+                        trace,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                    )
+                except TypeError:
+                    payload = None  # something orjson can't encode; let json report it
+            if payload is not None:
+                with open(out_path, "wb") as f:
+                    f.write(payload)
+            else:
+                with open(out_path, "w", encoding="utf-8") as f:
+                    json.dump(trace, f, ensure_ascii=False, indent=2)
             logger.info(f"[LIVE OCR] Trace saved: {out_path}")
         except Exception as e:
             logger.warning(f"Failed to write live OCR trace: {e}")
@@ -766,25 +1080,22 @@ class AutomatedFormFiller:
         if image is None:
             return ""
 
-        # Draw OCR/classification field overlays.
+        # Draw OCR/classification field overlays: all outlines at once, then the labels.
+        drawn = []
         for field in field_entries:
             box = field.get("box") or [0, 0, 0, 0]
             x, y, w, h = [int(v) for v in box]
             if w <= 0 or h <= 0:
                 continue
+            drawn.append((field, (x, y, w, h), _STATUS_COLORS.get(field.get("status", ""), _DEFAULT_STATUS_COLOR)))
+        if drawn:
+            _draw_box_outlines(
+                image,
+                np.array([box for _, box, _ in drawn], dtype=np.int64),
+                np.array([color for _, _, color in drawn], dtype=np.uint8),
+            )
 
-            status = field.get("status", "")
-            if status == "filled":
-                color = (60, 180, 75)  # green
-            elif status == "fill_failed":
-                color = (0, 0, 255)  # red
-            elif status == "ready_to_fill":
-                color = (255, 200, 0)  # amber
-            else:
-                color = (180, 180, 180)  # gray
-
-            cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
-
+        for field, (x, y, _, _), color in drawn:
             label = (
                 f"OCR idx={field.get('index')} "
                 f"{field.get('classified_as')} "
@@ -796,9 +1107,9 @@ class AutomatedFormFiller:
             cv2.putText(image, label, (x, ty), cv2.FONT_HERSHEY_SIMPLEX, 0.42, color, 1, cv2.LINE_AA)
 
         base = os.path.splitext(os.path.basename(screenshot_path))[0]
-        out_path = os.path.join(self.annotated_screenshots_dir, f"{base}_{suffix}.png")
+        out_path = os.path.join(self.annotated_screenshots_dir, f"{base}_{suffix}.{self.annotated_format}")
         try:
-            cv2.imwrite(out_path, image)
+            cv2.imwrite(out_path, image, self.annotated_write_params)
             logger.info(f"[ANNOTATE] Saved detection overlay: {out_path}")
             return out_path
         except Exception as e:
@@ -813,8 +1124,9 @@ class AutomatedFormFiller:
         form_meta = self._find_primary_form(page)
         if form_meta and form_meta.get("element") is not None:
             try:
-                form_meta["element"].screenshot(path=screenshot_path)
+                png_bytes = form_meta["element"].screenshot(path=screenshot_path)
                 return {
+                    "png_bytes": png_bytes,
                     "mode": "form",
                     "origin_px": form_meta.get("origin_px", (0, 0)),
                     "form_bbox": form_meta.get("bbox")
@@ -822,8 +1134,9 @@ class AutomatedFormFiller:
             except Exception as e:
                 logger.warning(f"Form screenshot failed, falling back to full page: {e}")
 
-        page.screenshot(path=screenshot_path, full_page=True)
+        png_bytes = page.screenshot(path=screenshot_path, full_page=True)
         return {
+            "png_bytes": png_bytes,
             "mode": "full",
             "origin_px": (0, 0),
             "form_bbox": None
@@ -834,55 +1147,36 @@ class AutomatedFormFiller:
         Find the most likely target form (largest visible form) and compute pixel origin.
         """
         try:
-            forms = page.query_selector_all("form")
-            if not forms:
+            # One evaluate measures every form; only the winner is fetched as a handle.
+            best = page.evaluate(_PRIMARY_FORM_JS)
+            if not best:
+                return None
+            form = page.query_selector('[data-ff-primary-form="1"]')
+            if form is None:
                 return None
 
-            transforms = page.evaluate("""() => ({
-                scrollX: window.scrollX,
-                scrollY: window.scrollY,
-                devicePixelRatio: window.devicePixelRatio
-            })""")
-            dpr = transforms.get("devicePixelRatio", 1)
-            scroll_x = transforms.get("scrollX", 0)
-            scroll_y = transforms.get("scrollY", 0)
-
-            best = None
-            for form in forms:
-                try:
-                    bbox = form.bounding_box()
-                    if not bbox:
-                        continue
-                    w = float(bbox.get("width", 0))
-                    h = float(bbox.get("height", 0))
-                    if w < 120 or h < 80:
-                        continue
-                    area = w * h
-                    if best is None or area > best["area"]:
-                        ox = int((bbox["x"] + scroll_x) * dpr)
-                        oy = int((bbox["y"] + scroll_y) * dpr)
-                        best = {
-                            "area": area,
-                            "element": form,
-                            "bbox": {
-                                "x": float(bbox["x"]),
-                                "y": float(bbox["y"]),
-                                "width": w,
-                                "height": h
-                            },
-                            "origin_px": (ox, oy)
-                        }
-                except Exception:
-                    continue
-
-            return best
+            dpr = best.get("devicePixelRatio", 1)
+            scroll_x = best.get("scrollX", 0)
+            scroll_y = best.get("scrollY", 0)
+            x = float(best["x"])
+            y = float(best["y"])
+            return {
+                "area": float(best["area"]),
+                "element": form,
+                "bbox": {
+                    "x": x,
+                    "y": y,
+                    "width": float(best["width"]),
+                    "height": float(best["height"])
+                },
+                "origin_px": (int((x + scroll_x) * dpr), int((y + scroll_y) * dpr))
+            }
         except Exception as e:
             logger.warning(f"Primary form detection failed: {e}")
             return None
 
     def _build_monitoring_diagnostics(self, live_trace, result):
         fields = live_trace.get("fields", [])
-        status_counts = Counter(f.get("status", "unknown") for f in fields)
         known_classifications = sum(1 for f in fields if f.get("classified_as") not in ("", "unknown"))
         submit = live_trace.get("submit", {})
         fill_attempts = int(result.get("fill_attempts", 0))
@@ -929,30 +1223,110 @@ class AutomatedFormFiller:
     def process_batch(self, urls_csv_path="Domains.csv", batch_size=10):
         """Process multiple URLs with rate limiting"""
         try:
+            # Line count only, for progress; the rows themselves are streamed below.
             with open(urls_csv_path) as f:
-                reader = csv.DictReader(f)
-                urls = [row["Website URL"] for row in reader if row.get("Website URL")]
+                total = max(sum(1 for _ in f) - 1, 0)
         except Exception as e:
             logger.error(f"Failed to read CSV: {e}")
             return
 
-        total = len(urls)
         logger.info(f"Starting batch processing of {total} URLs")
+        done = set()
+        if self.skip_successful_urls:
+            # Resume: URLs already recorded as successful in the results CSV are not resubmitted.
+            sink = self._results_sink(self.results_output_path)
+            done = {url for url, row in sink.rows.items() if row["Submission"] == "success"}
+        self.process_urls(self._iter_batch_urls(urls_csv_path, done), total=total)
+        if self.skipped_successful:
+            logger.info(f"Skipped {self.skipped_successful} URLs already submitted successfully")
+        self.save_results()
+        logger.info(f"Batch processing complete. Processed {total} URLs.")
 
-        for i, url in enumerate(urls):
-            if not url.startswith(("http://", "https://")):
-                logger.warning(f"Skipping invalid URL: {url}")
-                continue
+    def _iter_batch_urls(self, urls_csv_path, done=()):
+        """Valid 'Website URL' values from the batch CSV not in `done`, read lazily."""
+        try:
+            with open(urls_csv_path) as f:
+                for row in csv.DictReader(f):
+                    url = row.get("Website URL")
+                    if not url:
+                        continue
+                    if not url.startswith(("http://", "https://")):
+                        logger.warning(f"Skipping invalid URL: {url}")
+                        continue
+                    if url.strip() in done:
+                        self.skipped_successful += 1
+                        continue
+                    yield url
+        except Exception as e:
+            logger.error(f"Failed to read CSV: {e}")
 
-            self.process_url(url)
-            logger.info(f"Progress: {i + 1}/{total} URLs processed")
+    def process_urls(self, urls, workers=None, total=None):
+        """
+        Process URLs serially, or across `workers` processes (default:
+        system.max_concurrent_tabs), each with its own browser and OCR engine.
+        `urls` may be any iterable when `total` (used for progress) is given.
+        """
+        if total is None:
+            total = len(urls)
+        if workers is None:
+            workers = int(self.config.get("system", {}).get("max_concurrent_tabs", 1) or 1)
+        workers = max(1, min(int(workers), total))
+
+        if workers == 1:
+            # Rate limiting is per host: only back-to-back visits to the same site wait.
+            delay = float(self.config.get("processing", {}).get("delay_between_sites", 2) or 0)
+            last_visit = {}
+            for i, url in enumerate(urls):
+                host = self._sanitize_site_name(url)
+                wait = delay - (time.monotonic() - last_visit.get(host, float("-inf")))
+                if wait > 0:
+                    time.sleep(wait)
+                self.process_url(url)
+                last_visit[host] = time.monotonic()
+                logger.info(f"Progress: {i + 1}/{total} URLs processed")
+            return
 
-            # Rate limiting
-            if i < len(urls) - 1:
-                time.sleep(2)
+        # Shard by host so each site's rate limit is enforced inside a single worker.
+        shards = [[] for _ in range(workers)]
+        shard_by_host = {}
+        for url in urls:
+            host = self._sanitize_site_name(url)
+            n = shard_by_host.setdefault(host, len(shard_by_host) % workers)
+            shards[n].append(url)
+        shards = [shard for shard in shards if shard]
+
+        # Each worker upserts into its own CSV; rows are merged into results_output_path here.
+        root, ext = os.path.splitext(self.results_output_path)
+        part_paths = [f"{root}.part{n}{ext}" for n in range(len(shards))]
+        # spawn, not fork: the OCR/MiniLM warm-up threads may hold locks a forked child would inherit.
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=spawn) as pool:
+            futures = [
+                pool.submit(_process_url_chunk, *self._init_args, shard, part_path)
+                for shard, part_path in zip(shards, part_paths)
+            ]
+            for future in futures:
+                try:
+                    self.results.extend(future.result())
+                except Exception as e:
+                    logger.error(f"URL worker failed: {e}")
+                logger.info(f"Progress: {len(self.results)}/{total} URLs processed")
 
         self.save_results()
-        logger.info(f"Batch processing complete. Processed {total} URLs.")
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+
+    def _results_sink(self, out_path):
+        """The _ResultsCsv for out_path, (re)opened when the path changes."""
+        sink = self._results_csv
+        if sink is None or sink.path != out_path:
+            if sink is not None:
+                sink.close()
+            sink = self._results_csv = _ResultsCsv(out_path)
+        return sink
 
     def save_results(self, output_path=None):
         """Incrementally upsert run results into CSV."""
@@ -965,34 +1339,14 @@ class AutomatedFormFiller:
             if out_dir:
                 os.makedirs(out_dir, exist_ok=True)
 
-            fieldnames = ["URL", "Submission", "Reason"]
-            merged_by_url = {}
-            ordered_urls = []
-
-            if os.path.exists(out_path):
-                with open(out_path, 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        url = (row.get("URL") or "").strip()
-                        if not url:
-                            continue
-                        merged_by_url[url] = {
-                            "URL": url,
-                            "Submission": (
-                                row.get("Submission")
-                                or row.get("Submission status")
-                                or "unsuccessful"
-                            ),
-                            "Reason": (row.get("Reason") or row.get("reason") or "")
-                        }
-                        if url not in ordered_urls:
-                            ordered_urls.append(url)
-
-            for row in self.results:
+            sink = self._results_sink(out_path)
+
+            exported = []
+            for row in self.results[sink.exported:]:
                 url = (row.get("URL") or "").strip()
                 if not url:
                     continue
-                exported = {
+                exported.append({
                     "URL": url,
                     "Submission": (
                         row.get("Submission status")
@@ -1000,17 +1354,11 @@ class AutomatedFormFiller:
                         or "unsuccessful"
                     ),
                     "Reason": (row.get("reason") or row.get("Reason") or "")
-                }
-                if url not in merged_by_url:
-                    ordered_urls.append(url)
-                merged_by_url[url] = exported
+                })
+            sink.upsert(exported)
+            sink.exported = len(self.results)
 
-            with open(out_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows([merged_by_url[url] for url in ordered_urls if url in merged_by_url])
-
-            logger.info(f"Results saved incrementally to {out_path} ({len(ordered_urls)} rows)")
+            logger.info(f"Results saved incrementally to {out_path} ({len(sink.rows)} rows)")
         except Exception as e:
             logger.error(f"Failed to save results: {e}")
 
@@ -1019,34 +1367,61 @@ class AutomatedFormFiller:
         if not self.results:
             return {"error": "No results to analyze"}
 
-        successful = [r for r in self.results if r["Submission status"] == "success"]
-        captchas = [r for r in self.results if r.get("captcha_detected")]
-
-        total_fields_sum = sum(r.get("total_fields", 0) for r in self.results)
+        # One pass over the results for every aggregate.
+        n = len(self.results)
+        n_success = 0
+        n_captcha = 0
+        total_fields_sum = 0
+        processing_time_sum = 0
+        fields_filled_sum = 0
+        error_reasons = Counter()
+        for r in self.results:
+            if r["Submission status"] == "success":
+                n_success += 1
+            else:
+                error_reasons[r["reason"]] += 1
+            if r.get("captcha_detected"):
+                n_captcha += 1
+            total_fields_sum += r.get("total_fields", 0)
+            processing_time_sum += r.get("processing_time", 0)
+            fields_filled_sum += r.get("fields_filled", 0)
 
         report = {
-            "total_processed": len(self.results),
-            "successful_submissions": len(successful),
-            "success_rate": (len(successful) / len(self.results)) * 100 if self.results else 0,
-            "captcha_encounters": len(captchas),
-            "avg_processing_time": sum(r.get("processing_time", 0) for r in self.results) / len(self.results),
-            "avg_fields_per_form": sum(r.get("total_fields", 0) for r in self.results) / len(self.results),
-            "avg_fill_rate": (sum(r.get("fields_filled", 0) for r in self.results) /
-                            total_fields_sum) * 100 if total_fields_sum > 0 else 0,
-            "common_errors": {}
+            "total_processed": n,
+            "successful_submissions": n_success,
+            "success_rate": (n_success / n) * 100,
+            "captcha_encounters": n_captcha,
+            "avg_processing_time": processing_time_sum / n,
+            "avg_fields_per_form": total_fields_sum / n,
+            "avg_fill_rate": (fields_filled_sum / total_fields_sum) * 100 if total_fields_sum > 0 else 0,
+            "common_errors": dict(error_reasons.most_common(5)),
+            "skipped_already_successful": self.skipped_successful
         }
 
-        # Count error reasons
-        from collections import Counter
-        error_reasons = Counter([r["reason"] for r in self.results if r["Submission status"] != "success"])
-        report["common_errors"] = dict(error_reasons.most_common(5))
-
         return report
 
     def shutdown(self):
         """Clean shutdown"""
+        # Flush everything buffered first: pool workers exit without running atexit.
+        self._cv_pool.shutdown(wait=False)
+        self._trace_pool.shutdown(wait=True)
+        if self._results_csv is not None:
+            self._results_csv.close()
+        flush_unknown_patterns()
         self.browser.close()
 
+def _process_url_chunk(prefill_data_path, config_path, urls, results_path):
+    """process_urls worker: a private AutomatedFormFiller for one share of the URLs."""
+    filler = AutomatedFormFiller(prefill_data_path, config_path)
+    filler.results_output_path = results_path
+    try:
+        filler.process_urls(urls, workers=1)
+    finally:
+        # Spawned workers exit without atexit; shutdown() flushes the results CSV,
+        # queued live traces and the unknown-patterns log before returning.
+        filler.shutdown()
+    return filler.results
+
 # Entry point with error handling
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,49 @@
+"""
+DOM harvest regressions for fields that share a selector
+"""
+import pytest
+
+pytest.importorskip("cv2")
+sync_api = pytest.importorskip("playwright.sync_api")
+
+from core.dom_mapper import _FIELD_SELECTOR, _HARVEST_FIELDS_JS  # noqa: E402
+
+PAGE = """
+<form id="newsletter">
+  <input name="email" type="email">
+  <input name="plan" type="radio" value="free">
+  <input name="plan" type="radio" value="pro">
+  <input name="plan" type="radio" value="team">
+</form>
+<form>
+  <input name="email" type="email">
+  <button type="submit">Send</button>
+</form>
+"""
+
+
+@pytest.fixture(scope="module")
+def page():
+    try:
+        with sync_api.sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            yield page
+            browser.close()
+    except Exception as e:
+        pytest.skip(f"chromium unavailable: {e}")
+
+
+def test_fields_sharing_a_selector_keep_distinct_keys(page):
+    page.set_content(PAGE)
+    items = page.evaluate(_HARVEST_FIELDS_JS, {"selector": _FIELD_SELECTOR})
+    fields = [i for i in items if i["dom_type"] == "input"]
+    assert len(fields) == 5
+
+    keys = {(i["selector"], i["xpath"]) for i in fields}
+    assert len(keys) == len(fields)
+
+    radios = [i for i in fields if i["selector"] == 'input[name="plan"]']
+    emails = [i for i in fields if i["selector"] == 'input[name="email"]']
+    assert len(radios) == 3
+    assert len(emails) == 2
@@ -0,0 +1,42 @@
+"""
+OCR regressions for full-page captures
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+os.environ.setdefault("FORM_FILLER_NO_WARMUP", "1")
+
+from core.ocr import MAX_OCR_WIDTH, TextExtractor  # noqa: E402
+
+
+def _tall_page(width=1280, height=5000, text="Thank you", y=2600):
+    """White full-page capture with one line of dark text far below the fold."""
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.putText(page, text, (100, y), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 0, 0), 4, cv2.LINE_AA)
+    return page
+
+
+def test_whole_image_preprocess_keeps_full_resolution():
+    page = _tall_page()
+    processed = TextExtractor()._preprocess_image(page, downscale=False)
+    assert processed.shape == page.shape[:2]
+
+
+def test_field_preprocess_caps_width_only():
+    roi = _tall_page(width=2 * MAX_OCR_WIDTH, height=300, y=150)
+    processed = TextExtractor()._preprocess_image(roi)
+    assert processed.shape[1] == MAX_OCR_WIDTH
+    assert processed.shape[0] == 150
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract binary not installed")
+def test_tall_full_page_capture_reads_confirmation_text():
+    text, conf = TextExtractor().extract_with_context(_tall_page(), None)
+    assert "thank" in text
+    assert conf > 0
@@ -0,0 +1,52 @@
+"""
+Detector regressions on a synthetic contact form
+"""
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from core.vision import UIElementDetector  # noqa: E402
+
+# Light-gray 1px outlines, as most themes draw text inputs.
+INPUTS = [(100, 100, 400, 36), (100, 170, 400, 36)]
+TEXTAREA = (100, 240, 400, 120)
+BUTTON = (100, 400, 120, 40)
+
+
+def _form_page():
+    page = np.full((900, 1280, 3), 255, dtype=np.uint8)
+    for x, y, w, h in INPUTS + [TEXTAREA]:
+        cv2.rectangle(page, (x, y), (x + w, y + h), (180, 180, 180), 1)
+    x, y, w, h = BUTTON
+    cv2.rectangle(page, (x, y), (x + w, y + h), (200, 120, 40), -1)
+    cv2.putText(page, "Send", (x + 25, y + 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(page, "Contact us", (100, 70), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+    return page
+
+
+def _find(detections, box, tol=3):
+    x, y, w, h = box
+    for det in detections:
+        if all(abs(a - b) <= tol for a, b in zip(det[:4], (x, y, w, h))):
+            return det
+    return None
+
+
+def test_detects_every_drawn_control():
+    detections = UIElementDetector().detect_form_elements(None, image=_form_page())
+    for box in INPUTS:
+        found = _find(detections, box)
+        assert found is not None, f"input {box} not detected in {detections}"
+        assert found[4] == "input"
+    found = _find(detections, TEXTAREA)
+    assert found is not None and found[4] == "textarea"
+    assert _find(detections, BUTTON) is not None
+
+
+def test_file_and_array_inputs_agree(tmp_path):
+    page = _form_page()
+    path = str(tmp_path / "form.png")
+    cv2.imwrite(path, page)
+    detector = UIElementDetector()
+    assert detector.detect_form_elements(path) == detector.detect_form_elements(None, image=page)